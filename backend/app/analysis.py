@@ -0,0 +1,156 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, List, Optional
+from .predict import predict_article, predictor
+from .scraper import extract_article_text_async, canonical_url, invalid_url
+from .bias_detector import detect_political_bias, detect_political_bias_batch
+from .cache import scrape_cache, bias_cache, content_hash
+from .singleflight import SingleFlight
+from .near_duplicates import near_duplicate_index, minhash_signature
+from .metrics import near_duplicate_lookups
+
+# URL analysis shared by /analyze-url and bulk jobs: scrape, predict, credibility text and political bias
+
+
+class AnalysisError(Exception):
+    # Carries the HTTP status the single-URL endpoint responds with, bulk jobs report it per item
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def scrape_url(url: str) -> Dict:
+    # Scrape article text, reusing a recent scrape of the same article if we have one
+    url_key = canonical_url(url)
+    scraped_data = scrape_cache.get(url_key)
+    if scraped_data is None:
+        scraped_data = await extract_article_text_async(url)
+        # Only cache real articles so a temporary failure isn't remembered
+        if 'error' not in scraped_data and not scraped_data.get('is_stale'):
+            scrape_cache.set(url_key, scraped_data)
+
+    if 'error' in scraped_data:
+        raise AnalysisError(scraped_data.get('status_code', 400), f"Failed to scrape URL: {scraped_data['error']}")
+
+    if not scraped_data.get('text'):
+        raise AnalysisError(400, "No text content could be extracted from the URL.")
+
+    return scraped_data
+
+
+def credibility_analysis(prediction_result: Dict) -> str:
+    # Add credibility analysis based on the prediction
+    if prediction_result['is_fake']:
+        fake_probability = prediction_result['fake_probability']
+        if fake_probability > 90:
+            return "This article contains multiple red flags indicating it is highly likely to be fake news."
+        elif fake_probability > 70:
+            return "This article shows significant patterns common in fake news sources."
+        else:
+            return "This article has some characteristics of misinformation, suggesting caution is warranted."
+    else:
+        real_probability = prediction_result['real_probability']
+        if real_probability > 90:
+            return "This article demonstrates strong credibility patterns typical of reliable news sources."
+        elif real_probability > 70:
+            return "This article appears to be generally credible, with patterns consistent with legitimate reporting."
+        else:
+            return "The article analysis is inconclusive, possibly due to parsing difficulties or unusual text structure. Please verify with additional sources."
+
+
+def political_bias(text: str) -> Dict:
+    text_key = content_hash(text)
+    bias_data = bias_cache.get(text_key)
+    if bias_data is None:
+        bias_data = detect_political_bias(text)
+        bias_cache.set(text_key, bias_data)
+    return bias_data
+
+
+# Concurrent analyses of the same article share one scrape and one prediction
+analysis_flights = SingleFlight('analyze_url')
+
+
+def political_bias_batch(texts: List[str]) -> List[Dict]:
+    # Cached results where we have them, one vectorized batch for the rest
+    text_keys = [content_hash(text) for text in texts]
+    results = [bias_cache.get(text_key) for text_key in text_keys]
+    missing = [index for index, result in enumerate(results) if result is None]
+    for index, bias_data in zip(missing, detect_political_bias_batch([texts[index] for index in missing])):
+        bias_cache.set(text_keys[index], bias_data)
+        results[index] = bias_data
+    return results
+
+
+def bias_fields(bias_data: Dict) -> Dict:
+    # The political bias part of AnalyzeUrlResponse
+    return {
+        'political_bias': bias_data['bias'],
+        'bias_score': bias_data.get('bias_score', 0),
+        'is_political': bias_data.get('is_political', False),
+        'bias_message': bias_data.get('message', '')
+    }
+
+
+async def analyze_url(url: str, predict: Callable[[str], Awaitable[Dict]] = predict_article) -> Dict:
+    # Returns the fields of AnalyzeUrlResponse or raises AnalysisError. Requests for the same canonical URL
+    # that arrive while one is already being analyzed wait for that one instead of fetching again.
+    rejected = invalid_url(url)
+    if rejected is not None:
+        raise AnalysisError(rejected['status_code'], rejected['error'])
+    result = await analysis_flights.do(canonical_url(url), lambda: run_analysis(url, predict))
+    return {**result, 'analyzed_url': url}
+
+
+def version_key(model_version) -> str:
+    return json.dumps(list(model_version))
+
+
+async def run_analysis(url: str, predict: Callable[[str], Awaitable[Dict]]) -> Dict:
+    scraped_data = await scrape_url(url)
+    text = scraped_data['text']
+
+    # A syndicated copy of an article already scored by this model reuses that verdict
+    signature = match = None
+    model_version = predictor.model_version
+    if near_duplicate_index is not None:
+        signature = await asyncio.to_thread(minhash_signature, text)
+    if signature is not None and model_version is not None:
+        match = await asyncio.to_thread(near_duplicate_index.find, signature, version_key(model_version))
+        near_duplicate_lookups.inc(result='hit' if match else 'miss')
+
+    duplicate_of = None
+    if match:
+        prediction_result = match['verdict']['prediction']
+        bias_data = match['verdict']['bias']
+        if canonical_url(match['url']) != canonical_url(url):
+            duplicate_of = match['url']
+    else:
+        # Get prediction result for the scraped text
+        prediction_result = await predict(text)
+
+        if 'error' in prediction_result:
+            raise AnalysisError(500, f"Error making prediction: {prediction_result['error']}")
+
+        # Detect political bias
+        bias_data = political_bias(text)
+
+        # Only stored when the model didn't change while scoring, so the verdict matches the version
+        if signature is not None and predictor.model_version is not None and (
+                model_version is None or predictor.model_version == model_version):
+            verdict = {'prediction': prediction_result, 'bias': bias_data}
+            await asyncio.to_thread(
+                near_duplicate_index.add, url, signature, version_key(predictor.model_version), verdict
+            )
+
+    return {
+        'analyzed_url': url,
+        'title': scraped_data.get('title', ''),
+        'source': scraped_data.get('source', ''),
+        'date': scraped_data.get('date', ''),
+        'credibility_analysis': credibility_analysis(prediction_result),
+        **bias_fields(bias_data),
+        **prediction_result,
+        'duplicate_of': duplicate_of
+    }
@@ -0,0 +1,309 @@
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from . import predict
+from .predict import init_worker, prepare_texts, score_texts, format_prediction, MODEL_FORMAT
+from .compact_model import COMPACT_MODEL_DIR, META_FILE
+from .bias_detector import detect_political_bias_batch
+from .analysis import bias_fields
+from .scraper import parse_article_html
+
+# Offline scoring of archived articles without going through the API. The input is read a chunk at a time,
+# each chunk is cleaned, scored and bias-checked in a worker process that loaded the model once, and each
+# chunk's results are written to their own part file as soon as they are ready. A checkpoint records how
+# many chunks are done, so an interrupted run picks up where it stopped.
+#
+#   python -m app.batch archive.jsonl results/ --jobs 8
+#   python -m app.batch pages.parquet results/ --html-column html --output-format parquet
+
+CHECKPOINT_FILE = '_checkpoint.json'
+# Files a run writes to the output directory, the only ones --restart removes. Trailing * covers the .tmp
+# files an interrupted write leaves behind.
+RUN_FILE_PATTERNS = ('part-[0-9][0-9][0-9][0-9][0-9].jsonl*', 'part-[0-9][0-9][0-9][0-9][0-9].parquet*',
+                     CHECKPOINT_FILE + '*')
+# Chunks submitted ahead per worker, enough to keep every core busy while bounding memory
+CHUNKS_PER_WORKER = 2
+PROGRESS_INTERVAL_SECONDS = 5
+
+# Every output row has all of these, so part files share one schema
+OUTPUT_COLUMNS = {
+    'row': 'Int64',
+    'id': 'string',
+    'title': 'string',
+    'date': 'string',
+    'prediction': 'string',
+    'confidence_score': 'float64',
+    'is_fake': 'boolean',
+    'fake_probability': 'float64',
+    'real_probability': 'float64',
+    'political_bias': 'string',
+    'bias_score': 'float64',
+    'is_political': 'boolean',
+    'bias_message': 'string',
+    'error': 'string',
+}
+
+# Filled in by scoring, cleared again when a row fails part way through
+PREDICTION_COLUMNS = [
+    'prediction', 'confidence_score', 'is_fake', 'fake_probability', 'real_probability',
+    'political_bias', 'bias_score', 'is_political', 'bias_message'
+]
+
+
+def input_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def count_rows(path: str, file_format: str) -> Optional[int]:
+    # Known up front for Parquet and JSONL, CSV rows can span lines so they are only counted as read
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if file_format == 'jsonl':
+        with open(path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+    return None
+
+
+def read_chunks(path: str, file_format: str, columns: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif file_format == 'jsonl':
+        with pd.read_json(path, lines=True, chunksize=chunksize, dtype=False) as reader:
+            for frame in reader:
+                yield frame
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def error_message(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def score_texts_into(rows: List[Dict], texts: Dict[int, str], include_bias: bool):
+    offsets = list(texts)
+    prepared = prepare_texts([texts[offset] for offset in offsets])
+    probabilities = score_texts(predict.worker_model, [text for text, _ in prepared])
+    for offset, row_probabilities in zip(offsets, probabilities):
+        rows[offset].update(format_prediction(row_probabilities))
+    if include_bias:
+        for offset, bias_data in zip(offsets, detect_political_bias_batch([texts[offset] for offset in offsets])):
+            rows[offset].update(bias_fields(bias_data))
+
+
+def score_chunk(chunk_index: int, first_row: int, values: List, ids: Optional[List], is_html: bool,
+                include_bias: bool):
+    # Runs in a worker process, predict.worker_model was loaded by init_worker. A row that fails gets
+    # its exception in the error column instead of failing the chunk, which would fail again on every resume.
+    rows = []
+    texts = {}
+    for offset, value in enumerate(values):
+        row = dict.fromkeys(OUTPUT_COLUMNS)
+        row['row'] = first_row + offset
+        rows.append(row)
+        try:
+            if ids is not None:
+                row['id'] = str(ids[offset])
+
+            if not isinstance(value, str) or not value.strip():
+                row['error'] = "empty text"
+            elif is_html:
+                article = parse_article_html(value, '')
+                if article is None:
+                    row['error'] = "no article content found"
+                else:
+                    row['title'], row['date'] = article['title'], article['date']
+                    texts[offset] = article['text']
+            else:
+                texts[offset] = value
+        except Exception as e:
+            row['error'] = error_message(e)
+
+    if texts:
+        try:
+            score_texts_into(rows, texts, include_bias)
+        except Exception:
+            # Find the rows at fault by scoring one at a time, the rest still get their results
+            for offset, text in texts.items():
+                try:
+                    score_texts_into(rows, {offset: text}, include_bias)
+                except Exception as e:
+                    rows[offset].update(dict.fromkeys(PREDICTION_COLUMNS))
+                    rows[offset]['error'] = error_message(e)
+    return chunk_index, rows
+
+
+def write_part(output_dir: str, chunk_index: int, rows: List[Dict], output_format: str):
+    # Written under a temporary name and renamed, so a part file is either complete or absent
+    path = os.path.join(output_dir, f'part-{chunk_index:05d}.{output_format}')
+    temp_path = path + '.tmp'
+    if output_format == 'parquet':
+        pd.DataFrame(rows, columns=list(OUTPUT_COLUMNS)).astype(OUTPUT_COLUMNS).to_parquet(temp_path, index=False)
+    else:
+        with open(temp_path, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    os.replace(temp_path, path)
+
+
+def run_settings(args) -> Dict:
+    # A checkpoint only applies to the same input read the same way
+    stat = os.stat(args.input)
+    return {
+        'input': os.path.abspath(args.input),
+        'input_size': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+        'column': args.html_column or args.text_column,
+        'is_html': bool(args.html_column),
+        'id_column': args.id_column,
+        'chunksize': args.chunksize,
+        'output_format': args.output_format,
+        'include_bias': not args.no_bias,
+    }
+
+
+def remove_run_files(output_dir: str):
+    # Only this tool's own files, the output directory may be shared with anything else
+    for pattern in RUN_FILE_PATTERNS:
+        for path in glob.glob(os.path.join(glob.escape(output_dir), pattern)):
+            os.remove(path)
+
+
+def load_checkpoint(output_dir: str, settings: Dict, restart: bool) -> Dict:
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if os.path.exists(path) and not restart:
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['settings'] != settings:
+            raise SystemExit(f"{output_dir} holds results of a different run, pass --restart to overwrite them")
+        return checkpoint
+    if restart:
+        remove_run_files(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    return {'settings': settings, 'chunks_done': 0, 'rows_done': 0, 'errors': 0}
+
+
+def save_checkpoint(output_dir: str, checkpoint: Dict):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=4)
+    os.replace(path + '.tmp', path)
+
+
+class Progress:
+    def __init__(self, total_rows: Optional[int], rows_done: int):
+        self.total_rows = total_rows
+        self.resumed_rows = rows_done
+        self.rows_done = rows_done
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def update(self, rows: int, force: bool = False):
+        self.rows_done += rows
+        now = time.perf_counter()
+        if not force and now - self.last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.last_report = now
+        elapsed = now - self.start
+        rate = (self.rows_done - self.resumed_rows) / elapsed if elapsed > 0 else 0
+        line = f"{self.rows_done} rows"
+        if self.total_rows:
+            line += f" of {self.total_rows} ({self.rows_done / self.total_rows:.1%})"
+            if rate > 0:
+                line += f", ETA {(self.total_rows - self.rows_done) / rate:.0f}s"
+        print(f"{line}, {rate:.1f} rows/s, {elapsed:.1f}s elapsed", flush=True)
+
+
+def run(args):
+    file_format = input_format(args.input)
+    column = args.html_column or args.text_column
+    columns = [column] + ([args.id_column] if args.id_column else [])
+
+    settings = run_settings(args)
+    checkpoint = load_checkpoint(args.output, settings, args.restart)
+    skip_chunks = checkpoint['chunks_done']
+    if skip_chunks:
+        print(f"Resuming after {checkpoint['rows_done']} rows ({skip_chunks} chunks) from {args.output}")
+
+    progress = Progress(count_rows(args.input, file_format), checkpoint['rows_done'])
+
+    def finish(future):
+        chunk_index, rows = future.result()
+        write_part(args.output, chunk_index, rows, args.output_format)
+        # Chunks finish in submission order here, so everything up to this chunk is on disk
+        checkpoint['chunks_done'] = chunk_index + 1
+        checkpoint['rows_done'] += len(rows)
+        checkpoint['errors'] += sum(1 for row in rows if row['error'])
+        save_checkpoint(args.output, checkpoint)
+        progress.update(len(rows))
+
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=init_worker,
+        initargs=(args.model_path, args.compact_dir, args.model_format)
+    ) as pool:
+        in_flight = deque()
+        first_row = 0
+        for chunk_index, frame in enumerate(read_chunks(args.input, file_format, columns, args.chunksize)):
+            chunk_rows = len(frame)
+            if chunk_index >= skip_chunks:
+                in_flight.append(pool.submit(
+                    score_chunk,
+                    chunk_index,
+                    first_row,
+                    frame[column].tolist(),
+                    frame[args.id_column].tolist() if args.id_column else None,
+                    bool(args.html_column),
+                    not args.no_bias
+                ))
+                while len(in_flight) >= args.jobs * CHUNKS_PER_WORKER:
+                    finish(in_flight.popleft())
+            first_row += chunk_rows
+        while in_flight:
+            finish(in_flight.popleft())
+
+    progress.update(0, force=True)
+    print(f"Scored {checkpoint['rows_done']} rows ({checkpoint['errors']} errors) into {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score an archive of articles offline")
+    parser.add_argument('input', help="JSONL, CSV or Parquet file, the format is taken from the extension")
+    parser.add_argument('output', help="Directory for the part files and the checkpoint")
+    parser.add_argument('--text-column', default='text', help="Column holding the article text")
+    parser.add_argument('--html-column', help="Column holding stored page HTML, extracted like the scraper does")
+    parser.add_argument('--id-column', help="Column copied to the output to identify each row")
+    parser.add_argument('--output-format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--chunksize', type=int, default=500, help="Rows per chunk and per part file")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--no-bias', action='store_true', help="Skip political bias detection")
+    parser.add_argument('--restart', action='store_true', help="Discard earlier results in the output directory")
+    parser.add_argument('--model-path', default='models/fake_news_model.pkl')
+    parser.add_argument('--compact-dir', default=COMPACT_MODEL_DIR)
+    parser.add_argument('--model-format', default=MODEL_FORMAT, choices=['auto', 'compact', 'pickle'])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model_path) and not os.path.exists(os.path.join(args.compact_dir, META_FILE)):
+        parser.error(f"No model found at {args.model_path} or in {args.compact_dir}, train one first")
+    if args.output_format == 'parquet' or input_format(args.input) == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet input and output need pyarrow, pip install pyarrow")
+
+    run(args)
@@ -1,4 +1,9 @@
 import re
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+from scipy.sparse import csr_matrix
+from .metrics import time_stage
 
 # Define political bias indicators, could be improved and might be bias cuz of me. ALSO THIS IS VERY AMERICAN CENTRIC
 LEFT_LEANING_TERMS = [
@@ -52,16 +57,74 @@ Problems
 
 
 
-def is_political_content(text: str) -> bool:
-    # Determine if the content is political in nature
-    text_lower = text.lower()
-    
-    political_term_count = 0
-    for term in POLITICAL_TOPIC_INDICATORS:
-        pattern = r'\b' + re.escape(term) + r'\b'
-        political_term_count += len(re.findall(pattern, text_lower))
-    
-    word_count = len(text_lower.split())
+def build_trie_pattern(terms) -> str:
+    # Build a regex alternation shaped like a prefix trie, so at each position the engine branches on
+    # one character instead of trying every term in turn. Longer terms are preferred over their prefixes.
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def to_pattern(node):
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return to_pattern(trie)
+
+def build_term_matcher():
+    # Compile every term from the three lists into one pattern that is run once per article. Terms are
+    # lowercased since they're matched against lowercased text. Weights keep the list multiplicity
+    # ('pro-life' is listed twice in RIGHT_LEANING_TERMS) as (political, left, right).
+    weights = {}
+    for index, term_list in enumerate([POLITICAL_TOPIC_INDICATORS, LEFT_LEANING_TERMS, RIGHT_LEANING_TERMS]):
+        for term in term_list:
+            term_weights = weights.setdefault(term.lower(), [0, 0, 0])
+            term_weights[index] += 1
+
+    # The pattern only reports the longest term at each position, so remember which shorter terms also
+    # match there, e.g. 'law' inside 'law and order'
+    word_char = re.compile(r'\w')
+    prefixes = {
+        term: [other for other in weights
+               if len(other) < len(term) and term.startswith(other) and not word_char.match(term[len(other)])]
+        for term in weights
+    }
+
+    # Zero-width lookahead so overlapping terms starting at different positions are all found,
+    # e.g. both 'second amendment' and 'amendment'
+    pattern = re.compile(r'\b(?=(' + build_trie_pattern(weights) + r')\b)')
+    return pattern, {term: tuple(w) for term, w in weights.items()}, prefixes
+
+TERM_PATTERN, TERM_WEIGHTS, TERM_PREFIXES = build_term_matcher()
+
+def count_terms(text_lower: str) -> Counter:
+    # Count occurrences of every known term in one scan of the lowercased text
+    counts = Counter()
+    for match in TERM_PATTERN.finditer(text_lower):
+        term = match.group(1)
+        counts[term] += 1
+        for prefix in TERM_PREFIXES[term]:
+            counts[prefix] += 1
+    return counts
+
+def category_counts(term_counts: Counter):
+    # Sum term counts into (political, left, right) totals using the list weights
+    political_count = left_count = right_count = 0
+    for term, count in term_counts.items():
+        political_weight, left_weight, right_weight = TERM_WEIGHTS[term]
+        political_count += political_weight * count
+        left_count += left_weight * count
+        right_count += right_weight * count
+    return political_count, left_count, right_count
+
+def is_political_from_counts(political_term_count: int, word_count: int) -> bool:
     if word_count == 0:
         return False
         
@@ -70,71 +133,115 @@ def is_political_content(text: str) -> bool:
     # determine if content is political
     return political_term_count >= 3 or political_term_density >= 5
 
+def is_political_content(text: str) -> bool:
+    # Determine if the content is political in nature
+    text_lower = text.lower()
+    political_term_count, _, _ = category_counts(count_terms(text_lower))
+    return is_political_from_counts(political_term_count, len(text_lower.split()))
+
 def detect_political_bias(text: str):
     # Detect political bias in the text based on keyword analysis
+    with time_stage('bias_detection'):
+        return analyze_political_bias(text)
+
+# Bias labels by bias score (-100 to 100, negative is left, positive is right): a score below the
+# threshold gets that label, anything at or above the last threshold is strongly right-leaning
+BIAS_THRESHOLDS = [-30, -10, 10, 30]
+BIAS_LEVELS = [
+    ("Strongly Left-Leaning", "This content shows a strong left-leaning political bias."),
+    ("Moderately Left-Leaning", "This content shows a moderate left-leaning political bias."),
+    ("Neutral/Balanced", "This content appears to present a relatively balanced political perspective."),
+    ("Moderately Right-Leaning", "This content shows a moderate right-leaning political bias."),
+    ("Strongly Right-Leaning", "This content shows a strong right-leaning political bias."),
+]
+
+def not_political_result():
+    return {
+        "is_political": False,
+        "bias": "Not Political Content",
+        "bias_score": 0,
+        "message": "This content doesn't appear to be political in nature, so political bias analysis is not applicable."
+    }
+
+def no_bias_result():
+    return {
+        "is_political": True,
+        "bias": "Neutral/Balanced",
+        "bias_score": 0,
+        "left_term_count": 0,
+        "right_term_count": 0,
+        "message": "While this appears to be political content, no clear bias was detected."
+    }
+
+def bias_result(level: int, bias_score: float, left_count: int, right_count: int):
+    bias, message = BIAS_LEVELS[level]
+    return {
+        "is_political": True,
+        "bias": bias,
+        "bias_score": round(bias_score, 1),
+        "left_term_count": left_count,
+        "right_term_count": right_count,
+        "message": message
+    }
+
+def analyze_political_bias(text: str):
     text_lower = text.lower()
     
-    # First check if the content is political in nature
-    is_political = is_political_content(text)
+    # Count all three term categories in a single pass, then check if the content is political in nature
+    political_count, left_count, right_count = category_counts(count_terms(text_lower))
+    is_political = is_political_from_counts(political_count, len(text_lower.split()))
     
     if not is_political:
-        return {
-            "is_political": False,
-            "bias": "Not Political Content",
-            "bias_score": 0,
-            "message": "This content doesn't appear to be political in nature, so political bias analysis is not applicable."
-        }
-    
-    # Count occurrences of politically charged terms
-    left_count = 0
-    for term in LEFT_LEANING_TERMS:
-        pattern = r'\b' + re.escape(term) + r'\b'
-        left_count += len(re.findall(pattern, text_lower))
-    
-    right_count = 0
-    for term in RIGHT_LEANING_TERMS:
-        pattern = r'\b' + re.escape(term) + r'\b'
-        right_count += len(re.findall(pattern, text_lower))
+        return not_political_result()
     
     # Determine bias based on counts
     total_count = left_count + right_count
     if total_count == 0:
-        return {
-            "is_political": True,
-            "bias": "Neutral/Balanced",
-            "bias_score": 0,
-            "left_term_count": 0,
-            "right_term_count": 0,
-            "message": "While this appears to be political content, no clear bias was detected."
-        }
-    
-    left_percentage = (left_count / total_count) * 100
-    right_percentage = (right_count / total_count) * 100
+        return no_bias_result()
     
     # Calculate bias score (-100 to 100, negative is left, positive is right)
     bias_score = ((right_count - left_count) / total_count) * 100
     
-    if bias_score < -30:
-        bias = "Strongly Left-Leaning"
-        message = "This content shows a strong left-leaning political bias."
-    elif bias_score < -10:
-        bias = "Moderately Left-Leaning"
-        message = "This content shows a moderate left-leaning political bias."
-    elif bias_score < 10:
-        bias = "Neutral/Balanced"
-        message = "This content appears to present a relatively balanced political perspective."
-    elif bias_score < 30:
-        bias = "Moderately Right-Leaning"
-        message = "This content shows a moderate right-leaning political bias."
-    else:
-        bias = "Strongly Right-Leaning"
-        message = "This content shows a strong right-leaning political bias."
-    
-    return {
-        "is_political": True,
-        "bias": bias,
-        "bias_score": round(bias_score, 1),
-        "left_term_count": left_count,
-        "right_term_count": right_count,
-        "message": message
-    }
\ No newline at end of file
+    level = next((index for index, threshold in enumerate(BIAS_THRESHOLDS) if bias_score < threshold), len(BIAS_THRESHOLDS))
+    return bias_result(level, bias_score, left_count, right_count)
+
+# Column of each term in the document-by-term matrix, and the (political, left, right) weight of each column
+TERM_COLUMNS = {term: column for column, term in enumerate(TERM_WEIGHTS)}
+WEIGHT_MATRIX = np.array([TERM_WEIGHTS[term] for term in TERM_COLUMNS], dtype=np.int64)
+
+def term_count_matrix(texts_lower: List[str]) -> csr_matrix:
+    # Sparse document-by-term counts, one count_terms scan per document
+    rows, columns, counts = [], [], []
+    for row, text_lower in enumerate(texts_lower):
+        for term, count in count_terms(text_lower).items():
+            rows.append(row)
+            columns.append(TERM_COLUMNS[term])
+            counts.append(count)
+    return csr_matrix((counts, (rows, columns)), shape=(len(texts_lower), len(TERM_COLUMNS)), dtype=np.int64)
+
+def detect_political_bias_batch(texts: List[str]) -> List[Dict]:
+    # Same results as calling detect_political_bias on each text, in the same order, with the category
+    # totals, political check, bias score and label computed as array operations over the whole batch
+    with time_stage('bias_detection_batch'):
+        texts_lower = [text.lower() for text in texts]
+        word_counts = np.array([len(text_lower.split()) for text_lower in texts_lower], dtype=np.int64)
+        categories = term_count_matrix(texts_lower) @ WEIGHT_MATRIX
+        political_counts, left_counts, right_counts = categories[:, 0], categories[:, 1], categories[:, 2]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = (political_counts * 1000) / word_counts
+            is_political = (word_counts > 0) & ((political_counts >= 3) | (density >= 5))
+            total_counts = left_counts + right_counts
+            bias_scores = ((right_counts - left_counts) / total_counts) * 100
+        levels = np.searchsorted(BIAS_THRESHOLDS, bias_scores, side='right')
+
+        results = []
+        for index in range(len(texts)):
+            if not is_political[index]:
+                results.append(not_political_result())
+            elif total_counts[index] == 0:
+                results.append(no_bias_result())
+            else:
+                results.append(bias_result(int(levels[index]), float(bias_scores[index]),
+                                           int(left_counts[index]), int(right_counts[index])))
+        return results
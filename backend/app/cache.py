@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from .metrics import CallbackMetric
+
+# Bounded in-memory caches for repeat lookups of the same URL or article body
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '3600'))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv('SCRAPE_CACHE_MAX_ENTRIES', '256'))
+SCRAPE_CACHE_TTL_SECONDS = float(os.getenv('SCRAPE_CACHE_TTL_SECONDS', '900'))
+FAILED_URL_CACHE_MAX_ENTRIES = int(os.getenv('FAILED_URL_CACHE_MAX_ENTRIES', '1024'))
+FAILED_URL_CACHE_TTL_SECONDS = float(os.getenv('FAILED_URL_CACHE_TTL_SECONDS', '300'))
+
+class TTLCache:
+    # LRU cache with a per-entry time to live and hit/miss counters
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+def content_hash(text: str) -> str:
+    # Stable key for an article body
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+# Scraped article dicts keyed by canonical URL
+scrape_cache = TTLCache(SCRAPE_CACHE_MAX_ENTRIES, SCRAPE_CACHE_TTL_SECONDS)
+# Why a URL could not be scraped, keyed by canonical URL, so repeat requests fail fast for a while
+failed_url_cache = TTLCache(FAILED_URL_CACHE_MAX_ENTRIES, FAILED_URL_CACHE_TTL_SECONDS)
+# predict_article results keyed by (model version, hash of the cleaned text)
+prediction_cache = TTLCache()
+# detect_political_bias results keyed by hash of the text it was run on
+bias_cache = TTLCache()
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        'scrape': scrape_cache.stats(),
+        'failed_urls': failed_url_cache.stats(),
+        'prediction': prediction_cache.stats(),
+        'bias': bias_cache.stats()
+    }
+
+def collect_cache_stat(stat: str):
+    return lambda: [({'cache': name}, stats[stat]) for name, stats in cache_stats().items()]
+
+CallbackMetric('fakenews_cache_hits_total', 'Cache lookups that found a live entry', 'counter', collect_cache_stat('hits'))
+CallbackMetric('fakenews_cache_misses_total', 'Cache lookups that found nothing or an expired entry', 'counter',
+               collect_cache_stat('misses'))
+CallbackMetric('fakenews_cache_evictions_total', 'Entries dropped to stay under the size limit', 'counter',
+               collect_cache_stat('evictions'))
+CallbackMetric('fakenews_cache_entries', 'Entries currently held', 'gauge', collect_cache_stat('entries'))
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# A domain's circuit opens after this many failed attempts in a row (connection errors, timeouts, 403/429/5xx)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+# How long an open circuit fails fast before one request is let through to probe the domain again
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '60'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class DomainCircuitBreaker:
+    # Circuit breaker per host. While a domain's circuit is open, requests to it fail fast instead of each
+    # spending its retries and timeouts on a site that is blocking us or down. After the cooldown a single
+    # probe request is allowed through; if it succeeds the circuit closes, otherwise it opens again.
+    # Retries of the probe request itself don't go through allow() again.
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.lock = threading.Lock()
+        self.circuits: Dict[str, Dict] = {}
+
+    def circuit(self, domain: str) -> Dict:
+        return self.circuits.setdefault(domain, {
+            'state': CLOSED, 'failures': 0, 'opened_at': 0.0, 'probe_started': 0.0, 'times_opened': 0, 'rejected': 0
+        })
+
+    def allow(self, domain: str) -> Optional[str]:
+        # None means fail fast, otherwise the state the request goes ahead in: HALF_OPEN for the one probe
+        # let through once an open circuit's cooldown is over. The probe's caller must call end_probe when
+        # it's done. A probe that hasn't reported back within another cooldown is given up on and the next
+        # request becomes the probe, so a lost probe can't keep the domain blocked.
+        with self.lock:
+            circuit = self.circuit(domain)
+            if circuit['state'] == CLOSED:
+                return CLOSED
+            now = time.monotonic()
+            if (circuit['state'] == OPEN and now - circuit['opened_at'] >= self.cooldown_seconds) or (
+                    circuit['state'] == HALF_OPEN and now - circuit['probe_started'] >= self.cooldown_seconds):
+                circuit['state'] = HALF_OPEN
+                circuit['probe_started'] = now
+                return HALF_OPEN
+            circuit['rejected'] += 1
+            return None
+
+    def state(self, domain: str) -> str:
+        with self.lock:
+            return self.circuit(domain)['state']
+
+    def retry_after(self, domain: str) -> float:
+        with self.lock:
+            circuit = self.circuit(domain)
+            if circuit['state'] == OPEN:
+                started = circuit['opened_at']
+            elif circuit['state'] == HALF_OPEN:
+                started = circuit['probe_started']
+            else:
+                return 0.0
+            return max(self.cooldown_seconds - (time.monotonic() - started), 0.0)
+
+    def end_probe(self, domain: str):
+        # A probe that ended without a success or failure being recorded (redirect loop, invalid URL,
+        # cancelled, unexpected error) counts as failed rather than leaving the circuit half open
+        with self.lock:
+            unresolved = self.circuit(domain)['state'] == HALF_OPEN
+        if unresolved:
+            self.record_failure(domain)
+
+    def record_success(self, domain: str):
+        with self.lock:
+            circuit = self.circuit(domain)
+            circuit['state'] = CLOSED
+            circuit['failures'] = 0
+
+    def record_failure(self, domain: str):
+        with self.lock:
+            circuit = self.circuit(domain)
+            circuit['failures'] += 1
+            if circuit['state'] == HALF_OPEN or (circuit['state'] == CLOSED and circuit['failures'] >= self.failure_threshold):
+                circuit['state'] = OPEN
+                circuit['opened_at'] = time.monotonic()
+                circuit['times_opened'] += 1
+                print(f"Circuit opened for {domain} after {circuit['failures']} failed attempts")
+
+    def stats(self) -> Dict[str, Dict]:
+        with self.lock:
+            now = time.monotonic()
+            return {
+                domain: {
+                    'state': circuit['state'],
+                    'consecutive_failures': circuit['failures'],
+                    'times_opened': circuit['times_opened'],
+                    'rejected_requests': circuit['rejected'],
+                    'retry_after_seconds': round(max(self.cooldown_seconds - (now - circuit['opened_at']), 0), 1)
+                    if circuit['state'] == OPEN else 0
+                }
+                for domain, circuit in self.circuits.items()
+            }
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Compact model format: the fitted TF-IDF vocabulary, IDF weights and LR coefficients as flat NumPy
+# arrays next to a small JSON file. The arrays are memory-mapped, so loading is near-instant and every
+# worker process on the host shares the same physical pages instead of unpickling its own vocabulary dict.
+COMPACT_MODEL_DIR = 'models/compact'
+VOCAB_FILE = 'vocab.npy'      # n-grams as UTF-8 bytes, sorted so lookups can use binary search
+IDF_FILE = 'idf.npy'          # IDF weight per n-gram, in vocab order
+COEF_FILE = 'coef.npy'        # logistic regression coefficient per n-gram, in vocab order
+META_FILE = 'meta.json'       # analyzer settings, intercept, classes and the source artifact it came from
+
+class CompactModel:
+    # Scores cleaned texts like the pickled TfidfVectorizer + LogisticRegression pipeline, exposing the
+    # same predict_proba so ModelPredictor can use either one
+    def __init__(self, directory: str = COMPACT_MODEL_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        self.vocab = np.load(os.path.join(directory, VOCAB_FILE), mmap_mode='r')
+        self.idf = np.load(os.path.join(directory, IDF_FILE), mmap_mode='r')
+        self.coef = np.load(os.path.join(directory, COEF_FILE), mmap_mode='r')
+        self.intercept = float(self.meta['intercept'])
+        self.classes_ = np.array(self.meta['classes'])
+        self.max_term_bytes = self.vocab.dtype.itemsize
+
+        self.lowercase = self.meta['lowercase']
+        self.token_pattern = re.compile(self.meta['token_pattern'])
+        self.stop_words = frozenset(self.meta['stop_words'] or [])
+        self.min_n, self.max_n = self.meta['ngram_range']
+
+    def analyze(self, text: str) -> List[str]:
+        # Mirrors TfidfVectorizer's word analyzer: lowercase, tokenize, drop stop words, build n-grams
+        if self.lowercase:
+            text = text.lower()
+        tokens = [token for token in self.token_pattern.findall(text) if token not in self.stop_words]
+
+        min_n, max_n = self.min_n, self.max_n
+        if max_n == 1:
+            return tokens
+
+        ngrams = list(tokens) if min_n == 1 else []
+        if min_n == 1:
+            min_n += 1
+        for n in range(min_n, min(max_n + 1, len(tokens) + 1)):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(' '.join(tokens[i:i + n]))
+        return ngrams
+
+    def transform(self, texts: List[str]) -> csr_matrix:
+        # L2-normalized tf-idf matrix with one column per vocabulary entry, like TfidfVectorizer.transform.
+        # All documents' distinct n-grams are looked up in one vectorized binary search.
+        doc_ids = []
+        terms = []
+        counts = []
+        for doc_id, text in enumerate(texts):
+            for term, count in Counter(self.analyze(text)).items():
+                encoded = term.encode('utf-8')
+                if len(encoded) <= self.max_term_bytes:
+                    doc_ids.append(doc_id)
+                    terms.append(encoded)
+                    counts.append(count)
+
+        shape = (len(texts), len(self.vocab))
+        if not terms:
+            return csr_matrix(shape, dtype=np.float64)
+
+        terms = np.array(terms)
+        positions = np.searchsorted(self.vocab, terms)
+        positions[positions >= len(self.vocab)] = 0
+        known = self.vocab[positions] == terms
+
+        doc_ids = np.asarray(doc_ids)[known]
+        positions = positions[known]
+        weights = np.asarray(counts, dtype=np.float64)[known] * self.idf[positions]
+
+        norms = np.sqrt(np.bincount(doc_ids, weights * weights, minlength=len(texts)))
+        weights /= norms[doc_ids]
+        return csr_matrix((weights, (doc_ids, positions)), shape=shape)
+
+    def decision_function_features(self, features: csr_matrix) -> np.ndarray:
+        return features @ self.coef + self.intercept
+
+    def predict_proba_features(self, features: csr_matrix) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function_features(features)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return self.predict_proba_features(self.transform(texts))
+
+def read_meta(directory: str = COMPACT_MODEL_DIR) -> Dict:
+    with open(os.path.join(directory, META_FILE)) as f:
+        return json.load(f)
@@ -0,0 +1,165 @@
+import codecs
+import os
+import re
+from typing import List, Mapping, Optional
+from .metrics import download_cutoffs
+
+# Pages are read in chunks and decoded as they arrive, so a bloated or hostile page can't hold more than
+# SCRAPER_MAX_BYTES in memory or keep a worker reading long after the article text has gone by.
+SCRAPER_MAX_BYTES = int(os.getenv('SCRAPER_MAX_BYTES', str(5 * 1024 * 1024)))
+# Stop reading once the first <article> element has closed with enough paragraph text in it. Later
+# markup can't change what extract_content returns for such a page, apart from a publication date
+# that only appears after the article.
+SCRAPER_EARLY_CUTOFF = os.getenv('SCRAPER_EARLY_CUTOFF', '1') == '1'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Paragraph text the article needs before the rest of the page is skipped, well above the
+# extractors' MIN_ARTICLE_LENGTH since this count is a rough regex estimate
+EARLY_CUTOFF_MIN_TEXT = 1000
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+# Markers the cutoff watches for. The tags are short, so rescanning the last SCAN_OVERLAP characters
+# of the previous chunk catches one split across two chunks.
+MARKER_PATTERN = re.compile(r'<(/?)(article|title|body)\b', re.IGNORECASE)
+SCAN_OVERLAP = 16
+PARAGRAPH_PATTERN = re.compile(r'<p\b[^>]*>(.*?)</p\s*>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class ContentRejected(Exception):
+    # The response isn't an HTML page we are willing to download, retrying won't change that
+    pass
+
+
+def find_charset(content_type: str, head: bytes) -> str:
+    # Charset from the Content-Type header, then a <meta> tag near the top of the page, then UTF-8
+    match = CHARSET_PATTERN.search(content_type)
+    if match is None:
+        match = META_CHARSET_PATTERN.search(head[:2048])
+        if match is not None:
+            match = match.group(1).decode('ascii', 'ignore')
+    else:
+        match = match.group(1)
+    try:
+        return codecs.lookup(match).name if match else 'utf-8'
+    except LookupError:
+        return 'utf-8'
+
+
+class HTMLDownload:
+    # Feed it the response body chunk by chunk: feed() returns True once reading can stop, either because
+    # the byte cap was reached or because the article has been seen. text() returns what was read, decoded.
+    def __init__(self, headers: Mapping[str, str], max_bytes: int = SCRAPER_MAX_BYTES,
+                 early_cutoff: bool = SCRAPER_EARLY_CUTOFF):
+        # Reject what we can from the headers alone, before reading any of the body
+        content_type = headers.get('content-type', '')
+        media_type = content_type.split(';')[0].strip().lower()
+        if media_type and media_type not in HTML_CONTENT_TYPES:
+            download_cutoffs.inc(reason='content_type')
+            raise ContentRejected(f"not an HTML page ({media_type})")
+        content_length = headers.get('content-length')
+        if max_bytes and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            download_cutoffs.inc(reason='too_large')
+            raise ContentRejected(f"page is larger than {max_bytes} bytes ({content_length})")
+
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.early_cutoff = early_cutoff
+        self.bytes_read = 0
+        self.decoder = None
+        self.pending = b''
+        self.parts: List[str] = []
+        self.length = 0
+        self.truncated = False
+
+        # Cutoff state, offsets are into the decoded text
+        self.scanned = 0
+        self.title_done = False
+        self.article_depth = 0
+        self.article_start: Optional[int] = None
+        self.article_checked = False
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.max_bytes and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+
+        if self.decoder is None:
+            # Wait for enough of the page to find a <meta charset> before picking the decoder
+            self.pending += chunk
+            if len(self.pending) < 2048 and not self.truncated:
+                return False
+            chunk, self.pending = self.pending, b''
+            self.start_decoder(chunk)
+        self.append(self.decoder.decode(chunk))
+
+        if self.truncated:
+            download_cutoffs.inc(reason='byte_cap')
+            return True
+        if self.early_cutoff and self.article_complete():
+            download_cutoffs.inc(reason='article_complete')
+            self.truncated = True
+            return True
+        return False
+
+    def start_decoder(self, head: bytes):
+        self.decoder = codecs.getincrementaldecoder(find_charset(self.content_type, head))(errors='replace')
+
+    def append(self, text: str):
+        if text:
+            self.parts.append(text)
+            self.length += len(text)
+
+    def article_complete(self) -> bool:
+        if self.article_checked:
+            return False
+        # Scan what was just added plus the overlap, markers before self.scanned were already handled
+        window_start = max(self.length - len(self.parts[-1]) - SCAN_OVERLAP, 0) if self.parts else 0
+        text = self.text_from(window_start)
+        for match in MARKER_PATTERN.finditer(text):
+            position = window_start + match.start()
+            if position < self.scanned:
+                continue
+            self.scanned = window_start + match.end()
+            closing, tag = match.group(1), match.group(2).lower()
+            if tag == 'title' and closing:
+                self.title_done = True
+            elif tag == 'body':
+                # A <title> would have come in the head
+                self.title_done = True
+            elif tag == 'article':
+                if not closing:
+                    if self.article_start is None:
+                        self.article_start = position
+                    self.article_depth += 1
+                elif self.article_depth > 0:
+                    self.article_depth -= 1
+                    if self.article_depth == 0:
+                        # Only the first article counts, it is the container the extractors will pick
+                        self.article_checked = True
+                        return self.title_done and self.paragraph_length(self.article_start, position) >= EARLY_CUTOFF_MIN_TEXT
+        return False
+
+    def paragraph_length(self, start: int, end: int) -> int:
+        article = self.text_from(start)[:end - start]
+        return sum(len(TAG_PATTERN.sub('', paragraph).strip()) for paragraph in PARAGRAPH_PATTERN.findall(article))
+
+    def text_from(self, start: int) -> str:
+        # Decoded text from offset start onwards, joining only the parts that are needed
+        offset = self.length
+        index = len(self.parts)
+        while index > 0 and offset > start:
+            index -= 1
+            offset -= len(self.parts[index])
+        return ''.join(self.parts[index:])[start - offset:]
+
+    def text(self) -> str:
+        if self.decoder is None:
+            self.start_decoder(self.pending)
+            self.append(self.decoder.decode(self.pending))
+            self.pending = b''
+        self.append(self.decoder.decode(b'', final=True))
+        return ''.join(self.parts)
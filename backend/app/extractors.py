@@ -0,0 +1,163 @@
+import os
+from typing import Tuple
+from bs4 import BeautifulSoup
+
+# lxml is optional, without it every page goes through BeautifulSoup
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+# Elements that never hold article text
+UNWANTED_TAGS = ['script', 'style', 'nav', 'header', 'footer', 'aside', 'meta', 'svg', 'form']
+
+# Containers tried in order, the first one present in the page is treated as the article
+CONTAINER_SELECTORS = ['article', 'main', '[role="main"]', '#main-content', '.article-body', '.story-body']
+
+# Minimum text length for a strategy to count as having found the article
+MIN_ARTICLE_LENGTH = 200
+
+# 'lxml' or 'bs4', lxml is used by default when it is installed
+SCRAPER_PARSER = os.getenv('SCRAPER_PARSER', 'lxml' if lxml_html is not None else 'bs4')
+
+def extract_with_bs4(html: str) -> Tuple[str, str, str]:
+    # Return (title, date, article_text) using BeautifulSoup's pure python parser
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove unwanted elements
+    for element in soup.find_all(UNWANTED_TAGS):
+        element.decompose()
+
+    # Extract basic metadata about the article
+    title = ""
+    title_tag = soup.find('title')
+    if title_tag:
+        title = title_tag.get_text().strip()
+
+    # Try to get article publication date
+    date = ""
+    date_tags = soup.find_all(['time', 'meta'], attrs={'property': 'article:published_time'})
+    if date_tags:
+        for tag in date_tags:
+            if tag.has_attr('datetime'):
+                date = tag['datetime']
+                break
+            elif tag.has_attr('content'):
+                date = tag['content']
+                break
+
+    # Extract the main content
+    article_text = ""
+
+    # 1) Look for article tag or main content container
+    article_container = None
+    for container_selector in CONTAINER_SELECTORS:
+        container = soup.select_one(container_selector)
+        if container:
+            article_container = container
+            break
+
+    if article_container:
+        # Get all paragraphs from the article container
+        paragraphs = article_container.find_all('p')
+        article_text = ' '.join(p.get_text().strip() for p in paragraphs if p.get_text().strip())
+
+    # 2) If article container approach didn't work, try all paragraphs
+    if not article_text or len(article_text) < MIN_ARTICLE_LENGTH:
+        paragraphs = soup.find_all('p')
+        # Filter out short paragraphs that might be navigation/footer text
+        main_paragraphs = [p for p in paragraphs if len(p.get_text().strip()) > 20]
+        if main_paragraphs:
+            article_text = ' '.join(p.get_text().strip() for p in main_paragraphs)
+
+    # 3) If all else fails, get all text
+    if not article_text or len(article_text) < MIN_ARTICLE_LENGTH:
+        # Last resort: get all text but filter out short lines
+        text_blocks = [t for t in soup.stripped_strings if len(t) > 20]
+        article_text = ' '.join(text_blocks)
+
+    return title, date, article_text
+
+def container_rank(element) -> int:
+    # Index of the first selector in CONTAINER_SELECTORS this element matches, or -1
+    if element.tag == 'article':
+        return 0
+    if element.tag == 'main':
+        return 1
+    if element.get('role') == 'main':
+        return 2
+    if element.get('id') == 'main-content':
+        return 3
+    classes = element.get('class')
+    if classes:
+        classes = classes.split()
+        if 'article-body' in classes:
+            return 4
+        if 'story-body' in classes:
+            return 5
+    return -1
+
+def extract_with_lxml(html: str) -> Tuple[str, str, str]:
+    # Same container -> paragraphs -> all text fallback as extract_with_bs4, on libxml2's C parser.
+    # One walk drops unwanted elements and one walk collects the title, date, containers and paragraphs.
+    try:
+        parser = lxml_html.HTMLParser(encoding='utf-8', remove_comments=True)
+        document = lxml_html.document_fromstring(html.encode('utf-8', 'surrogatepass'), parser=parser)
+    except (etree.ParserError, ValueError):
+        return "", "", ""
+
+    # drop_tree keeps the element's tail text, like decompose does in BeautifulSoup
+    for element in list(document.iter(*UNWANTED_TAGS)):
+        element.drop_tree()
+
+    title_tag = None
+    date = ""
+    containers = [None] * len(CONTAINER_SELECTORS)
+    paragraphs = []
+    for element in document.iter(tag=etree.Element):
+        tag = element.tag
+        if tag == 'p':
+            paragraphs.append(element)
+        elif tag == 'title' and title_tag is None:
+            title_tag = element
+        elif tag == 'time' and not date and element.get('property') == 'article:published_time':
+            date = element.get('datetime') or element.get('content') or ""
+
+        rank = container_rank(element)
+        if rank >= 0 and containers[rank] is None:
+            containers[rank] = element
+
+    title = title_tag.text_content().strip() if title_tag is not None else ""
+
+    # Extract the main content
+    article_text = ""
+
+    # 1) Look for article tag or main content container
+    article_container = next((container for container in containers if container is not None), None)
+    if article_container is not None:
+        texts = [p.text_content().strip() for p in article_container.iter('p')]
+        article_text = ' '.join(text for text in texts if text)
+
+    # 2) If article container approach didn't work, try all paragraphs
+    if not article_text or len(article_text) < MIN_ARTICLE_LENGTH:
+        texts = [p.text_content().strip() for p in paragraphs]
+        main_paragraphs = [text for text in texts if len(text) > 20]
+        if main_paragraphs:
+            article_text = ' '.join(main_paragraphs)
+
+    # 3) If all else fails, get all text
+    if not article_text or len(article_text) < MIN_ARTICLE_LENGTH:
+        text_blocks = [text.strip() for text in document.itertext()]
+        article_text = ' '.join(text for text in text_blocks if len(text) > 20)
+
+    return title, date, article_text
+
+EXTRACTORS = {
+    'bs4': extract_with_bs4,
+    'lxml': extract_with_lxml if lxml_html is not None else extract_with_bs4,
+}
+
+def extract_content(html: str, parser: str = SCRAPER_PARSER) -> Tuple[str, str, str]:
+    # Fall back to BeautifulSoup for an unknown parser name
+    return EXTRACTORS.get(parser, extract_with_bs4)(html)
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from .analysis import analyze_url, AnalysisError
+from .batcher import MicroBatcher
+from .predict import predictor
+from .scraper import get_domain
+
+# Bulk URL analysis: a job fetches its URLs concurrently, scores them through a shared micro-batcher and
+# keeps the per-URL results in memory so they can be polled or streamed while the job runs.
+# Jobs live in this process only, so with several uvicorn workers a job is visible on the worker that created it.
+
+JOB_MAX_URLS = int(os.getenv('JOB_MAX_URLS', '10000'))
+# Articles being fetched or analyzed at once per job, and at most this many of them on the same site
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', '32'))
+JOB_DOMAIN_CONCURRENCY = int(os.getenv('JOB_DOMAIN_CONCURRENCY', '4'))
+# Finished jobs and their results are dropped after this long, and the oldest ones beyond JOB_MAX_JOBS
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+JOB_MAX_JOBS = int(os.getenv('JOB_MAX_JOBS', '100'))
+JOB_BATCH_MAX_SIZE = int(os.getenv('JOB_BATCH_MAX_SIZE', '64'))
+JOB_BATCH_MAX_WAIT_MS = float(os.getenv('JOB_BATCH_MAX_WAIT_MS', '50'))
+
+
+class BulkJob:
+    def __init__(self, urls: List[str]):
+        self.id = uuid.uuid4().hex
+        self.urls = urls
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # One line per finished URL, in completion order, each tagged with the URL's index in the request
+        self.results: List[Dict] = []
+        self.succeeded = 0
+        self.failed = 0
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'cancelled', 'failed')
+
+    async def add_result(self, result: Dict):
+        async with self.changed:
+            self.results.append(result)
+            if 'error' in result:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+            self.changed.notify_all()
+
+    async def set_status(self, status: str):
+        async with self.changed:
+            self.status = status
+            if self.finished:
+                self.finished_at = time.time()
+            self.changed.notify_all()
+
+    async def stream_results(self, offset: int = 0):
+        # Yield every result from offset onwards, waiting for new ones until the job finishes
+        position = offset
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.results) > position or self.finished)
+                new_results = self.results[position:]
+                finished = self.finished
+            for result in new_results:
+                yield result
+            position += len(new_results)
+            if finished and position >= len(self.results):
+                return
+
+    def progress(self) -> Dict:
+        completed = len(self.results)
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': len(self.urls),
+            'completed': completed,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+            'urls_per_second': round(completed / elapsed, 2) if elapsed else None
+        }
+
+
+class JobManager:
+    def __init__(self,
+                 concurrency: int = JOB_CONCURRENCY,
+                 domain_concurrency: int = JOB_DOMAIN_CONCURRENCY,
+                 retention_seconds: float = JOB_RETENTION_SECONDS,
+                 max_jobs: int = JOB_MAX_JOBS):
+        self.concurrency = concurrency
+        self.domain_concurrency = domain_concurrency
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self.jobs: 'OrderedDict[str, BulkJob]' = OrderedDict()
+        # Jobs score through their own batcher so a bulk run fills large predict_proba calls
+        # regardless of PREDICT_BATCHING, and concurrent jobs share those batches
+        self.batcher = MicroBatcher(predictor.score_prepared, JOB_BATCH_MAX_SIZE, JOB_BATCH_MAX_WAIT_MS)
+
+    def create(self, urls: List[str]) -> BulkJob:
+        self.prune()
+        job = BulkJob(urls)
+        self.jobs[job.id] = job
+        job.task = asyncio.ensure_future(self.run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[BulkJob]:
+        job = self.jobs.get(job_id)
+        if job is not None and job.task is not None and not job.task.done():
+            job.task.cancel()
+        return job
+
+    def prune(self):
+        # Drop expired finished jobs, then the oldest finished ones while over max_jobs
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished and now - job.finished_at > self.retention_seconds:
+                del self.jobs[job_id]
+        for job_id, job in list(self.jobs.items()):
+            if len(self.jobs) < self.max_jobs:
+                break
+            if job.finished:
+                del self.jobs[job_id]
+
+    async def shutdown(self):
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def predict(self, text: str) -> Dict:
+        return await predictor.predict_article(text, batcher=self.batcher)
+
+    async def run(self, job: BulkJob):
+        job.started_at = time.time()
+        await job.set_status('running')
+
+        # The domain semaphore is taken first so URLs waiting on a slow or rate-limited site
+        # don't hold the job-wide slots other sites could be using
+        job_slots = asyncio.Semaphore(self.concurrency)
+        domain_slots: Dict[str, asyncio.Semaphore] = {}
+
+        async def analyze_one(index: int, url: str):
+            domain = get_domain(url)
+            if domain not in domain_slots:
+                domain_slots[domain] = asyncio.Semaphore(self.domain_concurrency)
+            async with domain_slots[domain], job_slots:
+                try:
+                    result = await analyze_url(url, predict=self.predict)
+                    line = {'index': index, **result}
+                except AnalysisError as e:
+                    line = {'index': index, 'analyzed_url': url, 'error': e.detail, 'status_code': e.status_code}
+                except Exception as e:
+                    line = {'index': index, 'analyzed_url': url, 'error': str(e), 'status_code': 500}
+            await job.add_result(line)
+
+        tasks = [asyncio.ensure_future(analyze_one(index, url)) for index, url in enumerate(job.urls)]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await job.set_status('cancelled')
+            raise
+        except Exception as e:
+            print(f"Bulk job {job.id} failed: {str(e)}")
+            await job.set_status('failed')
+            return
+        await job.set_status('completed')
+
+
+job_manager = JobManager()
@@ -1,18 +1,58 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, model_validator
-from .predict import predict_article
-from .scraper import extract_article_text
-from .bias_detector import detect_political_bias
-from typing import Optional, Dict, Union
+from pydantic import BaseModel, Field, StringConstraints, model_validator
+from .predict import predict_article, predict_batch, predictor, MODEL_WARMUP, MODEL_WATCH_INTERVAL
+from .scraper import close_async_client, domain_rate_limiter, domain_circuit_breaker
+from .analysis import analyze_url as analyze_article_url, AnalysisError, political_bias_batch, bias_fields
+from .jobs import job_manager, JOB_MAX_URLS
+from .cache import cache_stats
+from .near_duplicates import near_duplicate_index
+from .metrics import render as render_metrics, request_duration
+from .profiler import request_profiler, render_collapsed, render_text
+from typing import Annotated, Optional, Dict, Union, List
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
 import re
+import secrets
+import time
+
+# Shared secret for /admin endpoints, sent as "Authorization: Bearer <token>". Without one they are disabled
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+
+async def warm_up_model():
+    try:
+        await predictor.load_model()
+        print(f"Model version {predictor.model_version} loaded and warmed up")
+    except Exception as e:
+        print(f"Model warmup failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the model in the background so /ready can answer while it loads
+    background_tasks = []
+    if MODEL_WARMUP:
+        background_tasks.append(asyncio.create_task(warm_up_model()))
+    if MODEL_WATCH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(predictor.watch_model(MODEL_WATCH_INTERVAL)))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Stop running bulk jobs, then release pooled scraper connections and inference workers on shutdown
+    await job_manager.shutdown()
+    await close_async_client()
+    predictor.close()
 
 # I SHOULD'VE JUST USED A PRETRAINED MODEL 
 app = FastAPI(
     title="Fake News Detection API",
     description="API for detecting fake news articles",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -24,6 +64,44 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template rather than raw path to keep the number of series bounded
+        route = request.scope.get('route')
+        request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else 'unmatched',
+            status=status
+        )
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    # Reading the profiles shouldn't add profiles of its own
+    if not request_profiler.enabled or request.url.path.startswith('/admin/profiles'):
+        return await call_next(request)
+    state = request_profiler.begin()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        request_profiler.end(
+            state,
+            request.method,
+            request.url.path,
+            route.path if route is not None else 'unmatched',
+            status
+        )
 
 class ArticleRequest(BaseModel):
     text: Optional[str] = Field(None, min_length=50, description="The article text to analyze")
@@ -36,6 +114,14 @@ class ArticleRequest(BaseModel):
             raise ValueError('Either text or url must be provided')
         return self
 
+# Same minimum as /predict, checked per text after trimming so a blank or whitespace-padded text is
+# rejected with its index instead of failing the whole batch at prediction time
+BatchText = Annotated[str, StringConstraints(strip_whitespace=True, min_length=50)]
+
+class BatchArticleRequest(BaseModel):
+    texts: List[BatchText] = Field(..., min_length=1, description="The article texts to analyze")
+    include_bias: bool = Field(False, description="Also run political bias detection on every text")
+
 class PredictionResponse(BaseModel):
     prediction: str
     confidence_score: float
@@ -43,6 +129,12 @@ class PredictionResponse(BaseModel):
     fake_probability: float
     real_probability: float
 
+class BatchPredictionResponse(PredictionResponse):
+    political_bias: Optional[str] = None
+    bias_score: Optional[float] = None
+    is_political: Optional[bool] = None
+    bias_message: Optional[str] = None
+
 class AnalyzeUrlResponse(PredictionResponse):
     analyzed_url: str
     title: Optional[str] = None
@@ -53,6 +145,30 @@ class AnalyzeUrlResponse(PredictionResponse):
     bias_score: Optional[float] = None
     is_political: Optional[bool] = None
     bias_message: Optional[str] = None
+    # Set when the article is a near-duplicate of one analyzed before, whose verdict was reused
+    duplicate_of: Optional[str] = None
+
+class BulkJobRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, description="The article URLs to analyze")
+
+class JobProgressResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    succeeded: int
+    failed: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    urls_per_second: Optional[float] = None
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if not authorization or not secrets.compare_digest(authorization.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Admin token required")
 
 @app.get("/")
 async def root():
@@ -60,7 +176,18 @@ async def root():
         "message": "Welcome to the Fake News Detection API",
         "endpoints": {
             "/predict": "POST - Analyze article text for fake news",
+            "/predict-batch": "POST - Analyze a list of article texts for fake news",
             "/analyze-url": "POST - Analyze URL for fake news",
+            "/jobs": "POST - Start a bulk URL analysis job",
+            "/jobs/{job_id}": "GET - Bulk job progress, DELETE - Cancel a bulk job",
+            "/jobs/{job_id}/results": "GET - Stream bulk job results as NDJSON",
+            "/cache/stats": "GET - Cache sizes and hit rates, near-duplicate index size",
+            "/scraper/rate-limits": "GET - Per-domain request spacing, queue depth and wait times",
+            "/scraper/circuits": "GET - Per-domain circuit breaker state for failing sites",
+            "/metrics": "GET - Prometheus metrics",
+            "/ready": "GET - 200 once the model is loaded and warmed up, 503 before",
+            "/admin/reload-model": "POST - Load the current model file and swap it in without downtime",
+            "/admin/profiles": "GET - Recent request profiles, /admin/profiles/{id} for one as text or collapsed stacks",
             "/docs": "GET - API documentation",
         }
     }
@@ -81,62 +208,117 @@ async def predict(request: ArticleRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict-batch", response_model=List[BatchPredictionResponse], response_model_exclude_none=True)
+async def predict_many(request: BatchArticleRequest):
+    # Predict a list of articles with one vectorized model call per chunk, results are in the same order as the input
+    results = await predict_batch(request.texts)
+    
+    errors = [result['error'] for result in results if 'error' in result]
+    if errors:
+        raise HTTPException(status_code=500, detail=errors[0])
+    
+    if request.include_bias:
+        # Bias detection for the whole list as one batch of array operations
+        bias_results = await asyncio.to_thread(political_bias_batch, request.texts)
+        results = [{**result, **bias_fields(bias_data)} for result, bias_data in zip(results, bias_results)]
+        
+    return results
 
 @app.post("/analyze-url", response_model=AnalyzeUrlResponse)
 async def analyze_url(request: ArticleRequest):
     # Analyze a URL for fake news by scraping the content and running it through the prediction model.
     if not request.url:
         raise HTTPException(status_code=400, detail="URL is required")
-    
-    # Scrape article text
-    scraped_data = extract_article_text(request.url)
-    
-    if 'error' in scraped_data:
-        raise HTTPException(status_code=400, detail=f"Failed to scrape URL: {scraped_data['error']}")
-    
-    if not scraped_data.get('text'):
-        raise HTTPException(status_code=400, detail="No text content could be extracted from the URL.")
 
-    # Get prediction result for the scraped text
-    prediction_result = await predict_article(scraped_data['text'])
-    
-    if 'error' in prediction_result:
-        raise HTTPException(status_code=500, detail=f"Error making prediction: {prediction_result['error']}")
-    
-    # Add credibility analysis based on the prediction
-    credibility_analysis = ""
-    if prediction_result['is_fake']:
-        fake_probability = prediction_result['fake_probability']
-        if fake_probability > 90:
-            credibility_analysis = "This article contains multiple red flags indicating it is highly likely to be fake news."
-        elif fake_probability > 70:
-            credibility_analysis = "This article shows significant patterns common in fake news sources."
-        else:
-            credibility_analysis = "This article has some characteristics of misinformation, suggesting caution is warranted."
-    else:
-        real_probability = prediction_result['real_probability']
-        if real_probability > 90:
-            credibility_analysis = "This article demonstrates strong credibility patterns typical of reliable news sources."
-        elif real_probability > 70:
-            credibility_analysis = "This article appears to be generally credible, with patterns consistent with legitimate reporting."
-        else:
-            credibility_analysis = "The article analysis is inconclusive, possibly due to parsing difficulties or unusual text structure. Please verify with additional sources."
-    
-    # Detect political bias
-    bias_data = detect_political_bias(scraped_data['text'])
-            
-    return AnalyzeUrlResponse(
-        analyzed_url=request.url,
-        title=scraped_data.get('title', ''),
-        source=scraped_data.get('source', ''),
-        date=scraped_data.get('date', ''),
-        credibility_analysis=credibility_analysis,
-        political_bias=bias_data['bias'],
-        bias_score=bias_data.get('bias_score', 0),
-        is_political=bias_data.get('is_political', False),
-        bias_message=bias_data.get('message', ''),
-        **prediction_result
-    )
+    try:
+        result = await analyze_article_url(request.url)
+    except AnalysisError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return AnalyzeUrlResponse(**result)
+
+@app.post("/jobs", response_model=JobProgressResponse, status_code=202)
+async def create_job(request: BulkJobRequest):
+    # Start a bulk analysis job, poll /jobs/{job_id} for progress or stream /jobs/{job_id}/results
+    if len(request.urls) > JOB_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"A job can contain at most {JOB_MAX_URLS} URLs")
+    return job_manager.create(request.urls).progress()
+
+@app.get("/jobs/{job_id}", response_model=JobProgressResponse)
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.progress()
+
+@app.get("/jobs/{job_id}/results")
+async def stream_job_results(job_id: str, offset: int = Query(0, ge=0)):
+    # NDJSON, one line per URL as it finishes: the AnalyzeUrlResponse fields plus the URL's index in the request,
+    # or index, analyzed_url, error and status_code for a URL that failed. The stream ends when the job does.
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def lines():
+        async for result in job.stream_results(offset):
+            yield json.dumps(result) + '\n'
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.delete("/jobs/{job_id}", response_model=JobProgressResponse)
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.progress()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    stats = cache_stats()
+    if near_duplicate_index is not None:
+        stats['near_duplicates'] = await asyncio.to_thread(near_duplicate_index.stats)
+    return stats
+
+@app.get("/scraper/rate-limits")
+async def get_rate_limits():
+    return domain_rate_limiter.stats()
+
+@app.get("/scraper/circuits")
+async def get_circuits():
+    # Per-domain circuit breaker state, domains in the 'open' state are failed fast until retry_after_seconds
+    return domain_circuit_breaker.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def ready():
+    # Readiness probe for load balancers and deploys, liveness is any answer from the server at all
+    if not predictor.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True, "model_version": predictor.model_version, "model_type": type(predictor.model).__name__}
+
+@app.post("/admin/reload-model", dependencies=[Depends(require_admin)])
+async def reload_model(force: bool = False):
+    # Requests keep being served by the current model while the new one loads
+    try:
+        return await predictor.reload_model(force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reload model, still serving the previous one: {str(e)}")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return request_profiler.stats()
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: int, format: str = Query('text', pattern='^(text|collapsed)$')):
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found, only the most recent ones are kept")
+    if format == 'collapsed':
+        return PlainTextResponse(render_collapsed(profile))
+    return PlainTextResponse(render_text(profile))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,174 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Minimal Prometheus text-format metrics. Values are per process, so with several uvicorn workers
+# each one reports its own series.
+
+# Latency buckets in seconds, from sub-millisecond model scoring up to slow multi-retry fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self) -> List[Sample]:
+        with self.lock:
+            return [(self.name, dict(zip(self.label_names, key)), value) for key, value in self.values.items()]
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: bucket counts (non-cumulative, last one is +Inf), sum, count
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self.lock:
+            for key, (bucket_counts, total, count) in self.series.items():
+                labels = dict(zip(self.label_names, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                    cumulative += bucket_count
+                    samples.append((self.name + '_bucket', {**labels, 'le': format_value(float(bound))}, cumulative))
+                samples.append((self.name + '_sum', labels, total))
+                samples.append((self.name + '_count', labels, count))
+        return samples
+
+class CallbackMetric(Metric):
+    # Reads its values at scrape time, for numbers another module already keeps (e.g. cache stats)
+    def __init__(self, name: str, description: str, metric_type: str,
+                 collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, description)
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, labels, value) for labels, value in self.collect()]
+
+REGISTRY: List[Metric] = []
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+# Shared metrics used across scraper, predict and bias_detector
+stage_duration = Histogram(
+    'fakenews_stage_duration_seconds',
+    'Time spent in each stage of scraping, prediction and bias detection',
+    ['stage']
+)
+request_duration = Histogram(
+    'fakenews_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route', 'status']
+)
+predict_queue_depth = Gauge(
+    'fakenews_predict_queue_depth',
+    'Prediction tasks submitted to the thread pool that have not started yet'
+)
+fetched_bytes = Counter(
+    'fakenews_fetched_bytes_total',
+    'Response body bytes downloaded by the scraper',
+    ['domain']
+)
+fetch_responses = Counter(
+    'fakenews_fetch_responses_total',
+    'Scraper HTTP responses by domain and status code',
+    ['domain', 'status']
+)
+download_cutoffs = Counter(
+    'fakenews_download_cutoffs_total',
+    'Page downloads stopped or refused early: article_complete, byte_cap, content_type or too_large',
+    ['reason']
+)
+coalesced_calls = Counter(
+    'fakenews_coalesced_calls_total',
+    'Calls that joined an identical call already in flight instead of repeating the work',
+    ['name']
+)
+near_duplicate_lookups = Counter(
+    'fakenews_near_duplicate_lookups_total',
+    'Near-duplicate index lookups for analyzed URLs: hit reuses a stored verdict, miss scores the article',
+    ['result']
+)
+
+def time_stage(stage: str):
+    return stage_duration.time(stage=stage)
@@ -1,109 +1,254 @@
+import argparse
+import hashlib
+import numpy as np
 import pandas as pd
 import joblib
 import json
 import os
-import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from itertools import zip_longest
+from zlib import crc32
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, ParameterGrid
 from sklearn.metrics import classification_report, accuracy_score, precision_score, recall_score, f1_score
+from .preprocessing import clean_text, clean_texts, CLEANER_KEY
+from .compact_model import COMPACT_MODEL_DIR, VOCAB_FILE, IDF_FILE, COEF_FILE, META_FILE
 
-def clean_text(text: str) -> str:
-    # Clean the article text by removing common patterns and noise.
-    if not isinstance(text, str):
-        return ""
-        
-    text = text.lower()
-    
-    # Remove Reuters attribution and similar patterns, I saw someone on kaggle talk about how this improved their model, TODO!
-    patterns_to_remove = [
-        r'\(reuters\)',
-        r'reuters\s*[-–—]\s*',
-        r'by\s+reuters',
-        r'\(ap\)',
-        r'associated\s+press\s*[-–—]\s*',
-        r'by\s+associated\s+press',
-        r'\(bloomberg\)',
-        r'bloomberg\s*[-–—]\s*',
-        r'by\s+bloomberg',
-        r'\(cnn\)',
-        r'cnn\s*[-–—]\s*',
-        r'by\s+cnn',
-        r'\(bbc\)',
-        r'bbc\s*[-–—]\s*',
-        r'by\s+bbc',
-        r'\(afp\)',
-        r'agence\s+france\s+presse\s*[-–—]\s*',
-        r'by\s+afp',
-    ]
-    
-    for pattern in patterns_to_remove:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    
-    # Remove URLs, email addresses, and special characters
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\S+@\S+', '', text)
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    
-    return text.strip()
+# Cleaned corpora and vectorized matrices are cached here, keyed by dataset hash, cleaner and vectorizer params
+TRAINING_CACHE_DIR = 'cache/training'
+
+VECTORIZER_PARAMS = {
+    'stop_words': 'english',
+    'max_df': 0.7,
+    'min_df': 5,
+    'ngram_range': (1, 2)
+}
+CLASSIFIER_PARAMS = {'max_iter': 1000}
+
+# Classifier settings tried by --search, each combination is fit in its own process
+SEARCH_GRID = {
+    'C': [0.25, 1.0, 4.0, 16.0],
+    'class_weight': [None, 'balanced']
+}
+
+# parquet needs pyarrow, without it the cleaned corpus is cached as a pickle
+try:
+    import pyarrow  # noqa: F401
+    CORPUS_FORMAT = 'parquet'
+except ImportError:
+    CORPUS_FORMAT = 'pkl'
+
+class StageTimer:
+    # Records wall-clock seconds per training stage for the metrics file
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+def dataset_hash(*paths) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+def params_hash(*values) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+def load_clean_corpus(true_path, fake_path, cache_dir, corpus_key, rebuild=False):
+    # Returns (df with cleaned 'text' and numeric 'label', raw fake count, raw real count)
+    corpus_file = os.path.join(cache_dir, f'corpus-{corpus_key}.{CORPUS_FORMAT}')
+    counts_file = os.path.join(cache_dir, f'corpus-{corpus_key}.json')
+    if not rebuild and os.path.exists(corpus_file) and os.path.exists(counts_file):
+        print(f"Using cached cleaned corpus {corpus_file}")
+        df = pd.read_parquet(corpus_file) if CORPUS_FORMAT == 'parquet' else pd.read_pickle(corpus_file)
+        with open(counts_file) as f:
+            counts = json.load(f)
+        return df, counts['fake_samples'], counts['real_samples']
 
-def train_fake_news_model(true_path="datasets/True.csv", fake_path="datasets/Fake.csv"):
-    models_dir = "models"
-    os.makedirs(models_dir, exist_ok=True)
     true_df = pd.read_csv(true_path)
     fake_df = pd.read_csv(fake_path)
     
     # cleaning dataseet and add labels
-    true_df['label'] = 'REAL'
-    fake_df['label'] = 'FAKE'
+    true_df['label'] = 1
+    fake_df['label'] = 0
     
-    df = pd.concat([true_df, fake_df], ignore_index=True)
+    df = pd.concat([true_df[['text', 'label']], fake_df[['text', 'label']]], ignore_index=True)
     df = df.dropna(subset=['text'])
     
     print("Cleaning article texts...")
-    df['text'] = df['text'].apply(clean_text)
+    df['text'] = clean_texts(df['text'], n_jobs=os.cpu_count() or 1)
+    df = df[df['text'].str.len() > 0].reset_index(drop=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if CORPUS_FORMAT == 'parquet':
+        df.to_parquet(corpus_file)
+    else:
+        df.to_pickle(corpus_file)
+    with open(counts_file, 'w') as f:
+        json.dump({'fake_samples': len(fake_df), 'real_samples': len(true_df)}, f)
+    return df, len(fake_df), len(true_df)
+
+def save_sparse(directory, name, matrix):
+    # Uncompressed CSR components so search workers can memory-map them instead of each loading a copy
+    matrix = matrix.tocsr()
+    np.save(os.path.join(directory, f'{name}_data.npy'), matrix.data)
+    np.save(os.path.join(directory, f'{name}_indices.npy'), matrix.indices)
+    np.save(os.path.join(directory, f'{name}_indptr.npy'), matrix.indptr)
+    with open(os.path.join(directory, f'{name}_shape.json'), 'w') as f:
+        json.dump(list(matrix.shape), f)
+
+def load_sparse(directory, name, mmap_mode='r'):
+    with open(os.path.join(directory, f'{name}_shape.json')) as f:
+        shape = tuple(json.load(f))
+    return csr_matrix((
+        np.load(os.path.join(directory, f'{name}_data.npy'), mmap_mode=mmap_mode),
+        np.load(os.path.join(directory, f'{name}_indices.npy'), mmap_mode=mmap_mode),
+        np.load(os.path.join(directory, f'{name}_indptr.npy'), mmap_mode=mmap_mode)
+    ), shape=shape, copy=False)
+
+def vectorize_corpus(df, features_dir, rebuild=False):
+    # Split, fit TF-IDF on the training split and cache the fitted vectorizer, matrices and labels
+    done_file = os.path.join(features_dir, 'complete')
+    if not rebuild and os.path.exists(done_file):
+        print(f"Using cached feature matrices in {features_dir}")
+        return
 
-    df = df[df['text'].str.len() > 0]
-    X = df['text']
-    y = df['label'].map({'FAKE': 0, 'REAL': 1})
+    X_train, X_test, y_train, y_test = train_test_split(df['text'], df['label'], test_size=0.2, random_state=42)
+    
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    train_matrix = vectorizer.fit_transform(X_train)
+    test_matrix = vectorizer.transform(X_test)
+    y_train = y_train.to_numpy()
+
+    # The search's fit/validation split of the training rows is stored as matrices of its own, so search
+    # workers memory-map them as they are. Selecting shuffled rows from X_train would copy it in every worker.
+    fit_rows, validation_rows = train_test_split(
+        np.arange(train_matrix.shape[0]), test_size=0.2, random_state=42, stratify=y_train
+    )
+
+    os.makedirs(features_dir, exist_ok=True)
+    save_sparse(features_dir, 'X_train', train_matrix)
+    save_sparse(features_dir, 'X_test', test_matrix)
+    save_sparse(features_dir, 'X_fit', train_matrix[fit_rows])
+    save_sparse(features_dir, 'X_validation', train_matrix[validation_rows])
+    np.save(os.path.join(features_dir, 'y_train.npy'), y_train)
+    np.save(os.path.join(features_dir, 'y_test.npy'), y_test.to_numpy())
+    np.save(os.path.join(features_dir, 'y_fit.npy'), y_train[fit_rows])
+    np.save(os.path.join(features_dir, 'y_validation.npy'), y_train[validation_rows])
+    joblib.dump(vectorizer, os.path.join(features_dir, 'vectorizer.pkl'))
+    # Written last so an interrupted run is never mistaken for a complete cache entry
+    with open(done_file, 'w') as f:
+        f.write(datetime.now().isoformat())
+
+_search_data = {}
+
+def init_search_worker(features_dir):
+    # Each worker memory-maps the cached fit and validation matrices once and reuses them for every fit it
+    # runs, the pages are shared between workers instead of each holding a copy
+    for split in ('fit', 'validation'):
+        _search_data[split] = (
+            load_sparse(features_dir, f'X_{split}'),
+            np.load(os.path.join(features_dir, f'y_{split}.npy'), mmap_mode='r')
+        )
+
+def evaluate_params(params):
+    start = time.perf_counter()
+    X_fit, y_fit = _search_data['fit']
+    X_validation, y_validation = _search_data['validation']
+    classifier = LogisticRegression(**{**CLASSIFIER_PARAMS, **params}).fit(X_fit, y_fit)
+    y_pred = classifier.predict(X_validation)
+    return {
+        'params': params,
+        'f1_score': f1_score(y_validation, y_pred, average='weighted'),
+        'accuracy': accuracy_score(y_validation, y_pred),
+        'fit_seconds': round(time.perf_counter() - start, 3)
+    }
+
+def search_hyperparameters(features_dir, grid=SEARCH_GRID, n_jobs=None):
+    # Fit every combination on a validation split of the cached training matrix across all cores
+    candidates = list(ParameterGrid(grid))
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(candidates))
+    print(f"Searching {len(candidates)} parameter combinations with {n_jobs} processes...")
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_search_worker, initargs=(features_dir,)) as pool:
+        results = list(pool.map(evaluate_params, candidates))
+    results.sort(key=lambda result: result['f1_score'], reverse=True)
+    for result in results:
+        print(f"  f1={result['f1_score']:.4f} {result['params']}")
+    return results
+
+def train_fake_news_model(true_path="datasets/True.csv", fake_path="datasets/Fake.csv",
+                          search=False, n_jobs=None, rebuild_cache=False, cache_dir=TRAINING_CACHE_DIR):
+    models_dir = "models"
+    os.makedirs(models_dir, exist_ok=True)
+    timer = StageTimer()
+
+    # Repeat runs on the same data skip cleaning and vectorizing entirely
+    with timer.stage('hash_dataset'):
+        # The cleaned text depends on the cleaner as much as on the data
+        corpus_key = params_hash(dataset_hash(true_path, fake_path), CLEANER_KEY)
+    with timer.stage('load_and_clean'):
+        df, fake_samples, real_samples = load_clean_corpus(true_path, fake_path, cache_dir, corpus_key, rebuild_cache)
+
+    features_dir = os.path.join(cache_dir, f'features-{params_hash(corpus_key, VECTORIZER_PARAMS)}')
+    with timer.stage('vectorize'):
+        vectorize_corpus(df, features_dir, rebuild_cache)
+        vectorizer = joblib.load(os.path.join(features_dir, 'vectorizer.pkl'))
+        X_train = load_sparse(features_dir, 'X_train', mmap_mode=None)
+        X_test = load_sparse(features_dir, 'X_test', mmap_mode=None)
+        y_train = np.load(os.path.join(features_dir, 'y_train.npy'))
+        y_test = np.load(os.path.join(features_dir, 'y_test.npy'))
+
+    classifier_params = dict(CLASSIFIER_PARAMS)
+    search_results = None
+    if search:
+        with timer.stage('search'):
+            search_results = search_hyperparameters(features_dir, n_jobs=n_jobs)
+        classifier_params.update(search_results[0]['params'])
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    print(f"Training model with {classifier_params}...")
+    with timer.stage('fit'):
+        classifier = LogisticRegression(**classifier_params).fit(X_train, y_train)
+    with timer.stage('evaluate'):
+        y_pred = classifier.predict(X_test)
 
     # Pipeline: TF-IDF + Logistic Regression
     pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(
-            stop_words='english',
-            max_df=0.7,
-            min_df=5,
-            ngram_range=(1, 2)
-        )),
-        ('clf', LogisticRegression(max_iter=1000)),
+        ('tfidf', vectorizer),
+        ('clf', classifier),
     ])
-
-    print("Training model (reverted to pre-GridSearchCV settings)...")
-    pipeline.fit(X_train, y_train)
-    y_pred = pipeline.predict(X_test)
     
     metrics = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'model_type': 'LogisticRegression', # Reverted model type
+        'model_type': 'LogisticRegression',
         'vectorizer': 'TfidfVectorizer',
         'dataset_stats': {
             'total_samples': len(df),
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
-            'fake_samples': len(fake_df),
-            'real_samples': len(true_df)
+            'train_samples': len(y_train),
+            'test_samples': len(y_test),
+            'fake_samples': fake_samples,
+            'real_samples': real_samples
         },
-        'model_parameters': { # Reverted to old model_parameters structure
-            'max_iter': 1000,
-            'max_df': 0.7,
-            'min_df': 5,
-            'ngram_range': (1, 2),
-            'stop_words': 'english'
+        'model_parameters': {
+            **classifier_params,
+            'max_df': VECTORIZER_PARAMS['max_df'],
+            'min_df': VECTORIZER_PARAMS['min_df'],
+            'ngram_range': VECTORIZER_PARAMS['ngram_range'],
+            'stop_words': VECTORIZER_PARAMS['stop_words']
         },
         'performance_metrics': {
             'accuracy': accuracy_score(y_test, y_pred),
@@ -113,15 +258,199 @@ def train_fake_news_model(true_path="datasets/True.csv", fake_path="datasets/Fak
         },
         'detailed_classification_report': classification_report(y_test, y_pred, output_dict=True)
     }
+    if search_results is not None:
+        metrics['hyperparameter_search'] = search_results
 
+    with timer.stage('save'):
+        model_file = os.path.join(models_dir, 'fake_news_model.pkl')
+        joblib.dump(pipeline, model_file) # Save the direct pipeline
+    print(f"Model trained and saved as {model_file}")
+
+    metrics['stage_timings_seconds'] = timer.timings
     metrics_file = os.path.join(models_dir, 'model_metrics.json')
     with open(metrics_file, 'w') as f:
         json.dump(metrics, f, indent=4)
     print(f"Training metrics saved to {metrics_file}")
 
+def iter_labeled_chunks(true_path, fake_path, chunksize):
+    # Read both CSVs a chunk at a time and interleave them, so every chunk has both classes
+    true_reader = pd.read_csv(true_path, usecols=['text'], chunksize=chunksize)
+    fake_reader = pd.read_csv(fake_path, usecols=['text'], chunksize=chunksize)
+    
+    for chunk_index, (true_chunk, fake_chunk) in enumerate(zip_longest(true_reader, fake_reader)):
+        parts = []
+        if true_chunk is not None:
+            parts.append(true_chunk.assign(label=1))
+        if fake_chunk is not None:
+            parts.append(fake_chunk.assign(label=0))
+        chunk = pd.concat(parts, ignore_index=True).dropna(subset=['text'])
+        # SGD is sensitive to ordering, shuffle within the chunk (same order every pass)
+        yield chunk.sample(frac=1, random_state=chunk_index)
+
+def is_test_row(text: str, test_size: float) -> bool:
+    # Deterministic hash split so the held-out set is identical on every pass without keeping it in memory
+    return crc32(text.encode('utf-8')) % 10000 < test_size * 10000
+
+def train_fake_news_model_streaming(true_path="datasets/True.csv", fake_path="datasets/Fake.csv",
+                                    chunksize=5000, n_features=2 ** 20, epochs=1, test_size=0.2,
+                                    compact_dir=COMPACT_MODEL_DIR):
+    # Out-of-core training for corpora that don't fit in memory. Features come from a stateless
+    # HashingVectorizer (no vocabulary to grow) and the classifier is fit with partial_fit one chunk at a
+    # time, so peak memory depends on chunksize and n_features, not on the size of the corpus.
+    models_dir = "models"
+    os.makedirs(models_dir, exist_ok=True)
+    
+    vectorizer = HashingVectorizer(
+        stop_words='english',
+        ngram_range=(1, 2),
+        n_features=n_features,
+        alternate_sign=False,
+        norm='l2'
+    )
+    classifier = SGDClassifier(loss='log_loss', alpha=1e-6, random_state=42)
+    classes = np.array([0, 1])
+    
+    for epoch in range(epochs):
+        print(f"Streaming epoch {epoch + 1}/{epochs}...")
+        train_samples = 0
+        for chunk in iter_labeled_chunks(true_path, fake_path, chunksize):
+            texts = clean_texts(chunk['text'])
+            train_mask = np.array([bool(text) and not is_test_row(text, test_size) for text in texts])
+            if not train_mask.any():
+                continue
+            X = vectorizer.transform([text for text, keep in zip(texts, train_mask) if keep])
+            classifier.partial_fit(X, chunk['label'].to_numpy()[train_mask], classes=classes)
+            train_samples += int(train_mask.sum())
+            print(f"  {train_samples} training articles seen")
+    
+    # Evaluate on the held-out rows with one more pass, only a running confusion matrix is kept
+    print("Evaluating on held-out articles...")
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    real_samples = fake_samples = 0
+    for chunk in iter_labeled_chunks(true_path, fake_path, chunksize):
+        real_samples += int((chunk['label'] == 1).sum())
+        fake_samples += int((chunk['label'] == 0).sum())
+        texts = clean_texts(chunk['text'])
+        test_mask = np.array([bool(text) and is_test_row(text, test_size) for text in texts])
+        if not test_mask.any():
+            continue
+        X = vectorizer.transform([text for text, keep in zip(texts, test_mask) if keep])
+        np.add.at(confusion, (chunk['label'].to_numpy()[test_mask], classifier.predict(X)), 1)
+
+    # The metrics are computed from the four (true, predicted) pairs weighted by their counts, which gives
+    # the same numbers as the full label lists
+    y_test, y_pred = np.array([0, 0, 1, 1]), np.array([0, 1, 0, 1])
+    weights = confusion.ravel()
+    test_samples = int(weights.sum())
+    
+    metrics = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'model_type': 'SGDClassifier',
+        'vectorizer': 'HashingVectorizer',
+        'dataset_stats': {
+            'total_samples': train_samples + test_samples,
+            'train_samples': train_samples,
+            'test_samples': test_samples,
+            'fake_samples': fake_samples,
+            'real_samples': real_samples
+        },
+        'model_parameters': {
+            'loss': 'log_loss',
+            'alpha': 1e-6,
+            'epochs': epochs,
+            'chunksize': chunksize,
+            'n_features': n_features,
+            'ngram_range': (1, 2),
+            'stop_words': 'english'
+        },
+        'performance_metrics': {
+            'accuracy': accuracy_score(y_test, y_pred, sample_weight=weights),
+            'precision': precision_score(y_test, y_pred, average='weighted', sample_weight=weights),
+            'recall': recall_score(y_test, y_pred, average='weighted', sample_weight=weights),
+            'f1_score': f1_score(y_test, y_pred, average='weighted', sample_weight=weights)
+        },
+        'confusion_matrix': confusion.tolist(),
+        'detailed_classification_report': classification_report(y_test, y_pred, sample_weight=weights, output_dict=True)
+    }
+    
+    metrics_file = os.path.join(models_dir, 'model_metrics.json')
+    with open(metrics_file, 'w') as f:
+        json.dump(metrics, f, indent=4)
+    print(f"Training metrics saved to {metrics_file}")
+    
+    pipeline = Pipeline([('hashing', vectorizer), ('clf', classifier)])
     model_file = os.path.join(models_dir, 'fake_news_model.pkl')
-    joblib.dump(pipeline, model_file) # Save the direct pipeline
+    joblib.dump(pipeline, model_file)
     print(f"Model trained and saved as {model_file}")
 
+    # Any compact export holds the previous TF-IDF model and hashed features can't be exported, so remove
+    # it rather than let the API keep serving a different model than the one just trained
+    if os.path.isdir(compact_dir):
+        shutil.rmtree(compact_dir)
+        print(f"Removed the compact model in {compact_dir}, the API serves {model_file} now")
+
+def export_compact_model(model_file="models/fake_news_model.pkl", output_dir=COMPACT_MODEL_DIR):
+    # Write the fitted pipeline as memory-mappable arrays for app.compact_model.CompactModel
+    pipeline = joblib.load(model_file)
+    vectorizer = pipeline.named_steps['tfidf']
+    classifier = pipeline.named_steps['clf']
+
+    if not isinstance(vectorizer, TfidfVectorizer) or not isinstance(classifier, LogisticRegression):
+        raise ValueError("Compact export needs a TfidfVectorizer + LogisticRegression pipeline")
+    if vectorizer.analyzer != 'word' or vectorizer.tokenizer or vectorizer.preprocessor or vectorizer.strip_accents:
+        raise ValueError("Compact export only supports the default word analyzer")
+    if vectorizer.binary or vectorizer.sublinear_tf or not vectorizer.use_idf or vectorizer.norm != 'l2':
+        raise ValueError("Compact export only supports raw term counts with idf weighting and l2 norm")
+    if len(classifier.classes_) != 2:
+        raise ValueError("Compact export only supports binary classifiers")
+
+    # Sort by UTF-8 bytes so the scorer can binary search the vocabulary
+    terms = sorted(vectorizer.vocabulary_.items(), key=lambda item: item[0].encode('utf-8'))
+    columns = np.array([column for _, column in terms])
+    vocab = np.array([term.encode('utf-8') for term, _ in terms])
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, VOCAB_FILE), vocab)
+    np.save(os.path.join(output_dir, IDF_FILE), vectorizer.idf_[columns].astype(np.float64))
+    np.save(os.path.join(output_dir, COEF_FILE), classifier.coef_[0][columns].astype(np.float64))
+
+    stat = os.stat(model_file)
+    stop_words = vectorizer.get_stop_words()
+    meta = {
+        'source_model': os.path.abspath(model_file),
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'intercept': float(classifier.intercept_[0]),
+        'classes': [int(c) for c in classifier.classes_],
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'stop_words': sorted(stop_words) if stop_words else None,
+        'ngram_range': list(vectorizer.ngram_range),
+        'vocabulary_size': len(terms)
+    }
+    with open(os.path.join(output_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=4)
+    print(f"Compact model with {len(terms)} terms exported to {output_dir}")
+
 if __name__ == "__main__":
-    train_fake_news_model()
+    parser = argparse.ArgumentParser(description="Train the fake news model")
+    parser.add_argument('--export-compact', action='store_true',
+                        help="Only export the existing model to the compact memory-mapped format")
+    parser.add_argument('--search', action='store_true',
+                        help="Search classifier hyperparameters across all cores before the final fit")
+    parser.add_argument('--jobs', type=int, default=None, help="Processes used by --search (default: all cores)")
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help="Ignore cached cleaned corpus and feature matrices and rebuild them")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Train out-of-core on CSV chunks with hashed features and partial_fit")
+    parser.add_argument('--chunksize', type=int, default=5000, help="Rows per CSV chunk in streaming mode")
+    parser.add_argument('--epochs', type=int, default=1, help="Passes over the data in streaming mode")
+    args = parser.parse_args()
+
+    if args.streaming:
+        # Hashed features have no vocabulary, so there's nothing to export to the compact format
+        train_fake_news_model_streaming(chunksize=args.chunksize, epochs=args.epochs)
+    else:
+        if not args.export_compact:
+            train_fake_news_model(search=args.search, n_jobs=args.jobs, rebuild_cache=args.rebuild_cache)
+        export_compact_model()
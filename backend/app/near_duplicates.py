@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from zlib import crc32
+
+import numpy as np
+
+from .preprocessing import clean_text
+
+# Near-duplicate index for syndicated stories: the same wire article republished with small edits on many
+# sites gets the verdict of the first copy we analyzed instead of being scored again. Articles are compared
+# by MinHash signatures over word shingles, and locality-sensitive hashing (LSH) over signature bands finds
+# candidates without comparing against every stored article. The index lives in SQLite next to the scrape
+# store, so it survives restarts, is shared by every worker on the host and doesn't grow process memory.
+NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_INDEX', '1') == '1'
+NEAR_DUP_PATH = os.getenv('NEAR_DUP_PATH', 'cache/near_duplicates.sqlite3')
+# Estimated Jaccard similarity of the shingle sets above which two articles count as the same story. A copy
+# with a new attribution and the last of ten paragraphs cut is around 0.9, one with a paragraph rewritten
+# around 0.8.
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.8'))
+# Oldest articles are dropped beyond this many
+NEAR_DUP_MAX_ENTRIES = int(os.getenv('NEAR_DUP_MAX_ENTRIES', '100000'))
+
+SHINGLE_WORDS = 5
+# Articles with fewer shingles than this are too short for a reliable signature
+MIN_SHINGLES = 20
+# With 16 bands of 8 rows, articles 0.8 similar share a band 95% of the time and 0.5 similar ones under 6%,
+# candidates are then checked against NEAR_DUP_THRESHOLD with the full signature
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Bounds the shingles x permutations matrix for very long articles
+SHINGLE_BLOCK = 4096
+# Check the entry limit every this many inserts rather than on each one
+PRUNE_EVERY = 500
+
+# Odd 64-bit constant mixing the word hashes of a shingle, the top 32 bits of the result are its hash
+SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Fixed seed: signatures are stored, so the hash functions must be the same after a restart
+_random = np.random.RandomState(20240601)
+PERM_A = _random.randint(1, 2 ** 63, size=NUM_PERM, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+PERM_B = _random.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    # 32-bit hashes of every distinct run of SHINGLE_WORDS words in the cleaned text. The model's
+    # cleaner drops wire attributions, so copies credited differently still line up.
+    words = clean_text(text).split()
+    if len(words) < SHINGLE_WORDS:
+        return np.empty(0, dtype=np.uint64)
+    # Each word is hashed once and the runs are combined with array arithmetic, joining and hashing every
+    # run as a string costs more than the rest of the signature
+    word_hashes = np.fromiter((crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+    count = len(words) - SHINGLE_WORDS + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        combined = combined * SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+    return np.unique(combined >> np.uint64(32))
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    # Minimum over the shingles of NUM_PERM multiply-shift hash functions, None for articles too short
+    hashes = shingle_hashes(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(hashes), SHINGLE_BLOCK):
+        # uint64 arithmetic wraps, the top 32 bits of a * x + b are the hash. Done in place, the
+        # temporaries of the plain expression took four times as long.
+        permuted = np.multiply(hashes[start:start + SHINGLE_BLOCK, None], PERM_A)
+        permuted += PERM_B
+        permuted >>= np.uint64(32)
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    # One 64-bit bucket key per band, the band number is mixed in so equal rows in different bands don't collide
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(rows, digest_size=8, person=band.to_bytes(2, 'little')).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: str = NEAR_DUP_PATH, threshold: float = NEAR_DUP_THRESHOLD,
+                 max_entries: int = NEAR_DUP_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # sqlite connections can't be shared between threads, so each thread opens its own
+        self.local = threading.local()
+        self.inserts = 0
+
+    def connect(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript('''
+                CREATE TABLE IF NOT EXISTS articles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    verdict TEXT NOT NULL,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    bucket INTEGER NOT NULL,
+                    article_id INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS bands_bucket ON bands (bucket);
+                CREATE INDEX IF NOT EXISTS bands_article ON bands (article_id);
+            ''')
+            self.local.connection = connection
+        return connection
+
+    def find(self, signature: np.ndarray, model_version: str) -> Optional[Dict]:
+        # The most similar stored article scored by the same model version, if it clears the threshold
+        keys = band_keys(signature)
+        rows = self.connect().execute(
+            'SELECT a.url, a.signature, a.verdict FROM articles a WHERE a.model_version = ? AND a.id IN '
+            f'(SELECT article_id FROM bands WHERE bucket IN ({",".join("?" * len(keys))}))',
+            [model_version, *keys]
+        ).fetchall()
+
+        best = None
+        best_similarity = self.threshold
+        for url, stored_signature, verdict in rows:
+            similarity = float(np.mean(np.frombuffer(stored_signature, dtype=np.uint32) == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = (url, verdict), similarity
+        if best is None:
+            return None
+        return {'url': best[0], 'similarity': round(best_similarity, 3), 'verdict': json.loads(best[1])}
+
+    def add(self, url: str, signature: np.ndarray, model_version: str, verdict: Dict):
+        with self.connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO articles (url, model_version, signature, verdict, added_at) VALUES (?, ?, ?, ?, ?)',
+                (url, model_version, signature.tobytes(), json.dumps(verdict), time.time())
+            )
+            connection.executemany(
+                'INSERT INTO bands (bucket, article_id) VALUES (?, ?)',
+                [(key, cursor.lastrowid) for key in band_keys(signature)]
+            )
+        self.inserts += 1
+        if self.inserts % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        # Keep the newest max_entries articles
+        with self.connect() as connection:
+            cutoff = connection.execute('SELECT MAX(id) FROM articles').fetchone()[0]
+            if cutoff is None or cutoff <= self.max_entries:
+                return
+            cutoff -= self.max_entries
+            connection.execute('DELETE FROM bands WHERE article_id <= ?', (cutoff,))
+            connection.execute('DELETE FROM articles WHERE id <= ?', (cutoff,))
+
+    def stats(self) -> Dict:
+        connection = self.connect()
+        return {
+            'entries': connection.execute('SELECT COUNT(*) FROM articles').fetchone()[0],
+            'max_entries': self.max_entries,
+            'threshold': self.threshold
+        }
+
+
+near_duplicate_index = NearDuplicateIndex() if NEAR_DUP_ENABLED else None
@@ -1,17 +1,224 @@
 import joblib
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Optional, Tuple
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import multiprocessing
+import numpy as np
 import os
+import time
+from .batcher import MicroBatcher
+from .preprocessing import clean_text
+from .cache import prediction_cache, content_hash
+from .compact_model import CompactModel, COMPACT_MODEL_DIR, META_FILE, read_meta
+from .metrics import time_stage, stage_duration, predict_queue_depth
 
 # Create a thread pool for CPU-bound tasks
 thread_pool = ThreadPoolExecutor(max_workers=4)
 
+async def run_in_pool(func, *args):
+    # Run CPU-bound work on thread_pool and keep the queue depth gauge up to date
+    predict_queue_depth.inc()
+    def run():
+        predict_queue_depth.dec()
+        return func(*args)
+    return await asyncio.get_event_loop().run_in_executor(thread_pool, run)
+
+# Largest number of articles sent to the model in a single predict_proba call
+BATCH_CHUNK_SIZE = 1000
+
+# 'auto' serves the memory-mapped compact model when it was exported from the current pickle,
+# 'compact' always uses it and 'pickle' always unpickles the full sklearn pipeline
+MODEL_FORMAT = os.getenv('MODEL_FORMAT', 'auto')
+
+def load_model_artifact(model_path: str, compact_dir: str = COMPACT_MODEL_DIR, model_format: str = MODEL_FORMAT):
+    # Returns (model, version). Anything with predict_proba over cleaned texts works as a model.
+    if model_format != 'pickle' and os.path.exists(os.path.join(compact_dir, META_FILE)):
+        meta = read_meta(compact_dir)
+        compact_version = (meta['source_mtime_ns'], meta['source_size'])
+        if model_format == 'compact' or not os.path.exists(model_path):
+            return CompactModel(compact_dir), compact_version
+        stat = os.stat(model_path)
+        if (stat.st_mtime_ns, stat.st_size) == compact_version:
+            return CompactModel(compact_dir), compact_version
+        print(f"Compact model in {compact_dir} is out of date with {model_path}, loading the pickle instead")
+
+    stat = os.stat(model_path)
+    return joblib.load(model_path), (stat.st_mtime_ns, stat.st_size)
+
+def prepare_texts(articles: List[str], timer=time_stage) -> List[Tuple[str, str]]:
+    # Clean exactly like training did and hash the cleaned text for the prediction cache
+    with timer('clean_text'):
+        cleaned_texts = [clean_text(article) for article in articles]
+    return [(text, content_hash(text)) for text in cleaned_texts]
+
+def score_texts(model, cleaned_texts: List[str], timer=time_stage):
+    # Score every article in one predict_proba call, timing vectorization and scoring separately
+    if isinstance(model, CompactModel):
+        with timer('tfidf_transform'):
+            features = model.transform(cleaned_texts)
+        with timer('lr_score'):
+            return model.predict_proba_features(features)
+    if hasattr(model, 'steps'):
+        with timer('tfidf_transform'):
+            features = model[:-1].transform(cleaned_texts)
+        with timer('lr_score'):
+            return model[-1].predict_proba(features)
+    with timer('score'):
+        return model.predict_proba(cleaned_texts)
+
+def format_prediction(probabilities) -> Dict[str, Union[str, float, bool]]:
+    # Turn one row of predict_proba output into the response dict
+    fake_prob = min(probabilities[0] * 100, 100)
+    real_prob = min(probabilities[1] * 100, 100)
+    
+    is_fake = bool(fake_prob > real_prob)
+    confidence_score = fake_prob if is_fake else real_prob
+    confidence_score = min(confidence_score, 100)
+    
+    return {
+        'prediction': 'FAKE' if is_fake else 'REAL',
+        'confidence_score': round(float(confidence_score), 2),
+        'is_fake': is_fake,
+        'fake_probability': round(float(fake_prob), 2),
+        'real_probability': round(float(real_prob), 2)
+    }
+
+# 'thread' cleans and scores on thread_pool, where tokenization is pure Python that holds the GIL, so one
+# uvicorn worker tops out near one core. 'process' does both in PREDICT_WORKERS child processes that each
+# load the model once; the compact model is memory-mapped, so the children share its pages.
+PREDICT_BACKEND = os.getenv('PREDICT_BACKEND', 'thread')
+PREDICT_WORKERS = int(os.getenv('PREDICT_WORKERS', '0')) or os.cpu_count() or 1
+# Smallest slice of a batch sent to one worker process, splitting smaller batches costs more than it saves
+PROCESS_MIN_CHUNK = 8
+
+# Set in each worker process by init_worker
+worker_model = None
+worker_model_version = None
+
+class StageTimings:
+    # Collects stage timings in a worker process so the parent can record them in its own metrics
+    def __init__(self):
+        self.timings: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def __call__(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((stage, time.perf_counter() - start))
+
+def init_worker(model_path: str, compact_dir: str, model_format: str):
+    global worker_model, worker_model_version
+    worker_model, worker_model_version = load_model_artifact(model_path, compact_dir, model_format)
+
+def get_worker_version():
+    return worker_model_version
+
+def clean_and_score_in_worker(articles: List[str]):
+    # Raw articles in, probabilities out: each article crosses the process boundary once
+    timings = StageTimings()
+    with timings('clean_text'):
+        cleaned_texts = [clean_text(article) for article in articles]
+    return score_texts(worker_model, cleaned_texts, timings), timings.timings, worker_model_version
+
+class ProcessScorer:
+    # Parent side of the process backend, ModelPredictor holds it in place of the model. Batches are
+    # split evenly across the workers; only the raw texts and the n x 2 probability arrays are pickled.
+    # Cleaning happens in the worker together with scoring, so the prediction cache is keyed by the hash
+    # of the raw text here instead of the cleaned one.
+    def __init__(self, model_path: str, compact_dir: str, model_format: str, workers: int = PREDICT_WORKERS):
+        self.workers = workers
+        self.version = None
+        # Requests holding this scorer. A scorer replaced by a reload is only shut down once the last of
+        # them is done, otherwise their next call would hit a closed executor.
+        self.in_use = 0
+        self.retired = False
+        # Spawn instead of fork so children don't inherit the parent's event loop and thread pool mid-flight
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(model_path, compact_dir, model_format)
+        )
+
+    async def start(self):
+        # Start every worker up front so they all load the same artifact, and return its version
+        loop = asyncio.get_running_loop()
+        versions = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, get_worker_version) for _ in range(self.workers)
+        ])
+        if len(set(versions)) > 1:
+            raise Exception("The model changed while worker processes were loading it")
+        self.version = versions[0]
+        return self.version
+
+    async def map(self, func, items: List):
+        loop = asyncio.get_running_loop()
+        size = max(PROCESS_MIN_CHUNK, -(-len(items) // self.workers))
+        return await asyncio.gather(*[
+            loop.run_in_executor(self.executor, func, items[start:start + size])
+            for start in range(0, len(items), size)
+        ])
+
+    def record_timings(self, timings: List[Tuple[str, float]]):
+        for stage, seconds in timings:
+            stage_duration.observe(seconds, stage=stage)
+
+    async def prepare(self, articles: List[str]) -> List[Tuple[str, str]]:
+        # Hashing is cheap enough for the parent, and cache hits then never reach a worker
+        with time_stage('content_hash'):
+            return [(article, content_hash(article)) for article in articles]
+
+    async def score(self, articles: List[str]):
+        results = await self.map(clean_and_score_in_worker, articles)
+        for _, timings, version in results:
+            if version != self.version:
+                raise Exception("A worker process is serving a different model version")
+            self.record_timings(timings)
+        return np.vstack([probabilities for probabilities, _, _ in results])
+
+    def release(self):
+        self.in_use -= 1
+        if self.retired and self.in_use == 0:
+            self.shutdown(cancel_futures=False)
+
+    def retire(self):
+        self.retired = True
+        if self.in_use == 0:
+            self.shutdown(cancel_futures=False)
+
+    def shutdown(self, cancel_futures: bool = True):
+        self.executor.shutdown(wait=False, cancel_futures=cancel_futures)
+
+# Preload and warm the model when the API starts instead of on the first request
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', '1') == '1'
+# Seconds between checks for a new model artifact, 0 turns the file watch off
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '0'))
+WARMUP_TEXT = "The senate passed the budget bill on Tuesday after a long debate, officials said in a statement."
+
+# Opt-in micro-batching: concurrent predict_article calls are coalesced into one predict_proba call
+BATCHING_ENABLED = os.getenv('PREDICT_BATCHING', '0') == '1'
+BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.getenv('PREDICT_BATCH_MAX_WAIT_MS', '5'))
+
 class ModelPredictor:
-    def __init__(self, model_path = 'models/fake_news_model.pkl'):
+    def __init__(self, model_path = 'models/fake_news_model.pkl', batching: bool = False,
+                 max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS,
+                 compact_dir: str = COMPACT_MODEL_DIR, model_format: str = MODEL_FORMAT,
+                 backend: str = PREDICT_BACKEND, workers: int = PREDICT_WORKERS):
         self.model_path = model_path
+        self.backend = backend
+        self.workers = workers
+        self.compact_dir = compact_dir
+        self.model_format = model_format
         self.model = None
+        self.model_version = None
+        self.loaded_signature = None
         self.load_lock = asyncio.Lock()
+        self.reload_lock = asyncio.Lock()
+        self.batcher = MicroBatcher(self.score_prepared, max_batch_size, max_wait_ms) if batching else None
 
     async def load_model(self):
         # Asynchronously load the model if it's not already loaded and check twice to avoid race condition
@@ -19,54 +226,196 @@ class ModelPredictor:
             async with self.load_lock:
                 if self.model is None: 
                     try:
-                        # Run model loading in thread pool since it's CPU-bound
-                        self.model = await asyncio.get_event_loop().run_in_executor(
-                            thread_pool,
-                            joblib.load,
-                            self.model_path
-                        )
+                        signature = self.artifact_signature()
+                        model, model_version = await self.build_warm_model()
+                        self.swap_model(model, model_version, signature)
                     except Exception as e:
                         raise Exception(f"Failed to load model from {self.model_path}: {str(e)}")
         return self.model
 
+    async def build_model(self):
+        with time_stage('model_load'):
+            if self.backend == 'process':
+                # Each worker process loads its own copy, the parent only keeps the handle
+                model = ProcessScorer(self.model_path, self.compact_dir, self.model_format, self.workers)
+                return model, await model.start()
+            # Run model loading in thread pool since it's CPU-bound
+            return await run_in_pool(
+                load_model_artifact,
+                self.model_path,
+                self.compact_dir,
+                self.model_format
+            )
 
-    async def predict_article(self, article_text: str):
-        # Asynchronously predict whether an article is fake news and return the confidence score
+    async def build_warm_model(self):
+        model, model_version = await self.build_model()
         try:
-            model = await self.load_model()
-            
-            # Run prediction in thread pool 
-            probabilities = await asyncio.get_event_loop().run_in_executor(
-                thread_pool,
-                lambda: model.predict_proba([article_text])[0]
-            )
-            
-            fake_prob = min(probabilities[0] * 100, 100)
-            real_prob = min(probabilities[1] * 100, 100)
+            await self.warm(model)
+        except Exception:
+            # Don't leave the new worker processes running when the model never goes into service
+            if isinstance(model, ProcessScorer):
+                model.shutdown()
+            raise
+        return model, model_version
+
+    async def warm(self, model):
+        # The first predict_proba pays one-off costs (page faults on the memory-mapped arrays, lazy imports),
+        # so pay them with a dummy article before the model takes real requests
+        with time_stage('model_warmup'):
+            prepared = await self.prepare(model, [WARMUP_TEXT])
+            await self.score(model, [text for text, _ in prepared])
+
+    def swap_model(self, model, model_version, signature):
+        # No await in here, so a request sees either the old model and version or the new ones, never a mix.
+        # Cached predictions are keyed by artifact version, so a new artifact never reuses old results.
+        old_model = self.model
+        self.model_version = model_version
+        self.model = model
+        self.loaded_signature = signature
+        prediction_cache.clear()
+        if isinstance(old_model, ProcessScorer):
+            # Requests that already hold the old workers still finish there
+            old_model.retire()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def artifact_signature(self):
+        # Changes whenever the pickle or the compact export is rewritten
+        signature = []
+        for path in (self.model_path, os.path.join(self.compact_dir, META_FILE)):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    async def reload_model(self, force: bool = False) -> Dict:
+        # Load the current artifact in the background and swap it in once it is warm. Requests keep using
+        # the old model until then, and if loading fails the old model stays in place.
+        async with self.reload_lock:
+            signature = self.artifact_signature()
+            if not force and self.model is not None and signature == self.loaded_signature:
+                return {'reloaded': False, 'model_version': self.model_version}
+            model, model_version = await self.build_warm_model()
+            self.swap_model(model, model_version, signature)
+            print(f"Loaded model version {model_version} from {self.model_path}")
+            return {'reloaded': True, 'model_version': model_version}
+
+    async def watch_model(self, interval: float):
+        # Reload when the artifact files change. A change must hold for one more interval before it is
+        # loaded so a model that is still being written isn't picked up half way.
+        pending = None
+        failed = None
+        while True:
+            await asyncio.sleep(interval)
+            # The first load happens through load_model, the watch only replaces a loaded model
+            if self.model is None:
+                continue
+            signature = self.artifact_signature()
+            if signature == self.loaded_signature or signature == failed:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature
+                continue
+            try:
+                await self.reload_model()
+            except Exception as e:
+                failed = signature
+                print(f"Model reload failed, still serving the previous model: {str(e)}")
+            pending = None
+
+    @asynccontextmanager
+    async def use_model(self):
+        # The current model, kept usable until the block exits even if a reload swaps in another one.
+        # Nothing awaits between load_model returning and the count going up, so a swap can't slip in.
+        model = await self.load_model()
+        if isinstance(model, ProcessScorer):
+            model.in_use += 1
+        try:
+            yield model
+        finally:
+            if isinstance(model, ProcessScorer):
+                model.release()
+
+    async def prepare(self, model, articles: List[str]) -> List[Tuple[str, str]]:
+        # (text to score, prediction cache key) per article. The thread backend cleans here, cleaning is
+        # CPU-bound too so it runs on the pool; the process backend cleans in the worker while scoring.
+        if isinstance(model, ProcessScorer):
+            return await model.prepare(articles)
+        return await run_in_pool(prepare_texts, articles)
+
+    async def score(self, model, texts: List[str]):
+        # Takes the texts prepare returned for the same model
+        if isinstance(model, ProcessScorer):
+            return await model.score(texts)
+        return await run_in_pool(score_texts, model, texts)
+
+    def close(self):
+        if isinstance(self.model, ProcessScorer):
+            self.model.shutdown()
+
+    def get_cached(self, text_hash: str):
+        cached = prediction_cache.get((self.model_version, text_hash))
+        return dict(cached) if cached is not None else None
+
+    async def score_prepared(self, prepared: List[Tuple[str, str]], chunk_size: int = BATCH_CHUNK_SIZE):
+        # Score prepared texts with one predict_proba call per chunk and remember the results,
+        # chunking only bounds the size of the sparse matrix for very large lists
+        async with self.use_model() as model:
+            model_version = self.model_version
+
+            results = []
+            for start in range(0, len(prepared), chunk_size):
+                chunk = prepared[start:start + chunk_size]
+                probabilities = await self.score(model, [text for text, _ in chunk])
+                for (_, text_hash), row in zip(chunk, probabilities):
+                    result = format_prediction(row)
+                    prediction_cache.set((model_version, text_hash), result)
+                    results.append(dict(result))
+            return results
+
+    async def predict_article(self, article_text: str, batcher: Optional[MicroBatcher] = None):
+        # Asynchronously predict whether an article is fake news and return the confidence score.
+        # Callers with their own batcher (e.g. bulk jobs) have misses scored through it instead of self.batcher.
+        batcher = batcher or self.batcher
+        try:
+            async with self.use_model() as model:
+                prepared = (await self.prepare(model, [article_text]))[0]
             
-            is_fake = fake_prob > real_prob
-            confidence_score = fake_prob if is_fake else real_prob
-            confidence_score = min(confidence_score, 100)
+            cached = self.get_cached(prepared[1])
+            if cached is not None:
+                return cached
             
-            return {
-                'prediction': 'FAKE' if is_fake else 'REAL',
-                'confidence_score': round(confidence_score, 2),
-                'is_fake': is_fake,
-                'fake_probability': round(fake_prob, 2),
-                'real_probability': round(real_prob, 2)
-            }
+            if batcher is not None:
+                return await batcher.submit(prepared)
+            return (await self.score_prepared([prepared]))[0]
         except Exception as e:
             return {
                 'error': f'Error making prediction: {str(e)}'
             }
 
-    async def predict_batch(self, articles: List[str]):
-        # Asynchronously predict multiple articles in parallel
-        tasks = [self.predict_article(article) for article in articles]
-        return await asyncio.gather(*tasks)
+    async def predict_batch(self, articles: List[str], chunk_size: int = BATCH_CHUNK_SIZE):
+        # Score the whole list with one predict_proba call per chunk instead of one call per article,
+        # articles that are already in the prediction cache are not scored again
+        try:
+            async with self.use_model() as model:
+                prepared = await self.prepare(model, articles)
+            
+            results = [self.get_cached(text_hash) for _, text_hash in prepared]
+            missing = [index for index, result in enumerate(results) if result is None]
+            scored = await self.score_prepared([prepared[index] for index in missing], chunk_size)
+            for index, result in zip(missing, scored):
+                results[index] = result
+            return results
+        except Exception as e:
+            return [{'error': f'Error making prediction: {str(e)}'} for _ in articles]
 
 
-predictor = ModelPredictor()
+predictor = ModelPredictor(batching=BATCHING_ENABLED)
 async def predict_article(article_text: str):
     return await predictor.predict_article(article_text)
 
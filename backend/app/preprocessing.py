@@ -0,0 +1,64 @@
+import hashlib
+import inspect
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List
+
+# Text normalization shared by training (model.py) and serving (predict.py), so the model always sees
+# text cleaned the same way it was trained on.
+
+# Publisher attributions, URLs and email addresses, removed one pattern at a time in this order. The order
+# matters: removing "reuters - " first turns "by reuters - washington" into "by washington", which the
+# by-reuters pattern then leaves alone, and the trained model learned from text cleaned exactly this way.
+# IGNORECASE stays even though the text is lowercased, it also matches the likes of "ſ" for "s".
+# I saw someone on kaggle talk about how stripping attributions improved their model
+REMOVE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\(reuters\)', r'reuters\s*[-–—]\s*', r'by\s+reuters',
+    r'\(ap\)', r'associated\s+press\s*[-–—]\s*', r'by\s+associated\s+press',
+    r'\(bloomberg\)', r'bloomberg\s*[-–—]\s*', r'by\s+bloomberg',
+    r'\(cnn\)', r'cnn\s*[-–—]\s*', r'by\s+cnn',
+    r'\(bbc\)', r'bbc\s*[-–—]\s*', r'by\s+bbc',
+    r'\(afp\)', r'agence\s+france\s+presse\s*[-–—]\s*', r'by\s+afp',
+)) + (
+    re.compile(r'http\S+|www\S+|https\S+'),
+    re.compile(r'\S+@\S+'),
+)
+
+# Replacing punctuation with a space and then collapsing whitespace is the same as collapsing
+# every run of non-word characters into a single space
+NON_WORD_PATTERN = re.compile(r'\W+')
+
+# Below this many texts a process pool costs more than it saves
+BULK_PARALLEL_MIN = 2000
+
+def clean_text(text: str) -> str:
+    # Clean the article text by removing common patterns and noise.
+    if not isinstance(text, str):
+        return ""
+
+    text = text.lower()
+    for pattern in REMOVE_PATTERNS:
+        text = pattern.sub('', text)
+    return NON_WORD_PATTERN.sub(' ', text).strip()
+
+# Identifies the cleaning rules, training caches of cleaned text and features built from it are keyed by
+# it so a change to the patterns or to clean_text never reuses text cleaned the old way
+CLEANER_KEY = hashlib.sha256('\n'.join([
+    *(f"{pattern.pattern} {pattern.flags}" for pattern in REMOVE_PATTERNS),
+    NON_WORD_PATTERN.pattern,
+    inspect.getsource(clean_text)
+]).encode('utf-8')).hexdigest()[:16]
+
+def clean_chunk(texts: List[str]) -> List[str]:
+    return [clean_text(text) for text in texts]
+
+def clean_texts(texts: Iterable[str], n_jobs: int = 1) -> List[str]:
+    # Bulk mode for training, cleans a whole column and optionally spreads it across processes
+    texts = list(texts)
+    if n_jobs <= 1 or len(texts) < BULK_PARALLEL_MIN:
+        return clean_chunk(texts)
+
+    chunk_size = -(-len(texts) // (n_jobs * 4))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return [text for cleaned in pool.map(clean_chunk, chunks) for text in cleaned]
@@ -0,0 +1,204 @@
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+# Opt-in sampling profiler for finding where request time goes in production. A background thread reads
+# the stack of every thread (event loop, predictor pool, asyncio.to_thread workers) at a fixed interval,
+# and the samples taken while a request was in flight become that request's profile. Requests are
+# profiled when picked at random (PROFILE_SAMPLE_RATE) or when they turn out slower than PROFILE_SLOW_MS,
+# which needs the sampler running all the time since slowness is only known at the end. With both unset
+# no thread is started and requests only pay for one attribute check.
+#
+# Samples cover the whole process, so a request's profile also includes whatever concurrent requests were
+# doing, in_flight on each profile says how many there were. Work done in PREDICT_BACKEND=process worker
+# processes isn't visible.
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+PROFILE_MAX_PROFILES = int(os.getenv('PROFILE_MAX_PROFILES', '20'))
+# Samples older than this are dropped, longer requests only keep their last PROFILE_MAX_SECONDS
+PROFILE_MAX_SECONDS = 60
+# Distinct stacks remembered so repeated samples share one string, cleared when it grows past this
+STACK_CACHE_MAX_ENTRIES = 10000
+
+# Leaf frames of threads that are blocked waiting for work, left out so profiles show only busy threads
+IDLE_FRAMES = {'threading.py:wait', 'queue.py:get', 'thread.py:_worker', 'selectors.py:select'}
+
+
+class SamplingProfiler:
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 interval_ms: float = PROFILE_INTERVAL_MS, max_profiles: int = PROFILE_MAX_PROFILES):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+        self.interval = interval_ms / 1000
+        self.enabled = sample_rate > 0 or slow_ms > 0
+        self.lock = threading.Lock()
+        # (perf_counter time, collapsed stacks of the busy threads)
+        self.samples = deque(maxlen=max(1, int(PROFILE_MAX_SECONDS / self.interval)))
+        self.profiles = deque(maxlen=max_profiles)
+        self.ids = itertools.count(1)
+        self.labels: Dict = {}
+        self.stacks: Dict = {}
+        self.thread_names: Dict[int, str] = {}
+        # Requests being sampled on purpose, the sampler sleeps when there are none and slow capture is off
+        self.active = 0
+        self.in_flight = 0
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.sampling_seconds = 0.0
+        self.sample_count = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while True:
+            if self.active == 0 and not self.slow_seconds:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+            # CPU time rather than wall time, which would also count waiting for the GIL
+            cpu_start = time.thread_time()
+            self.samples.append((time.perf_counter(), self.take_sample(own_ident)))
+            self.sampling_seconds += time.thread_time() - cpu_start
+            self.sample_count += 1
+            time.sleep(self.interval)
+
+    def frame_label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return label
+
+    def take_sample(self, own_ident: int) -> List[str]:
+        frames = sys._current_frames()
+        if not frames.keys() <= self.thread_names.keys():
+            self.thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        sample = []
+        for ident, frame in frames.items():
+            if ident == own_ident or self.frame_label(frame.f_code) in IDLE_FRAMES:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            key = (self.thread_names.get(ident, 'thread'), tuple(codes))
+            stack = self.stacks.get(key)
+            if stack is None:
+                if len(self.stacks) >= STACK_CACHE_MAX_ENTRIES:
+                    self.stacks.clear()
+                # Collapsed stack format: root first, thread name as the outermost frame
+                stack = self.stacks[key] = ';'.join([key[0]] + [self.frame_label(code) for code in reversed(codes)])
+            sample.append(stack)
+        return sample
+
+    def begin(self) -> Optional[Dict]:
+        # Called as a request starts, returns the state end() needs, None when profiling is off
+        if not self.enabled:
+            return None
+        sampled = random.random() < self.sample_rate
+        if self.thread is None:
+            self.start()
+        with self.lock:
+            self.in_flight += 1
+            if sampled:
+                self.active += 1
+        if sampled:
+            self.wake.set()
+        return {'sampled': sampled, 'start': time.perf_counter(), 'started_at': time.time()}
+
+    def end(self, state: Optional[Dict], method: str, path: str, route: str, status: int):
+        if state is None:
+            return
+        end = time.perf_counter()
+        duration = end - state['start']
+        with self.lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if state['sampled']:
+                self.active -= 1
+
+        slow = self.slow_seconds and duration >= self.slow_seconds
+        if not state['sampled'] and not slow:
+            return
+        stacks = Counter()
+        sample_count = 0
+        for taken_at, sample in list(self.samples):
+            if state['start'] <= taken_at <= end:
+                sample_count += 1
+                stacks.update(sample)
+        self.profiles.append({
+            'id': next(self.ids),
+            'method': method,
+            'path': path,
+            'route': route,
+            'status': status,
+            'reason': 'slow' if slow else 'sampled',
+            'started_at': state['started_at'],
+            'duration_ms': round(duration * 1000, 3),
+            'samples': sample_count,
+            'in_flight': in_flight,
+            'stacks': stacks
+        })
+
+    def get(self, profile_id: int) -> Optional[Dict]:
+        for profile in list(self.profiles):
+            if profile['id'] == profile_id:
+                return profile
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_seconds * 1000,
+            'interval_ms': self.interval * 1000,
+            'samples_taken': self.sample_count,
+            'sampling_cpu_seconds': round(self.sampling_seconds, 3),
+            'profiles': [
+                {key: value for key, value in profile.items() if key != 'stacks'}
+                for profile in reversed(self.profiles)
+            ]
+        }
+
+
+def render_collapsed(profile: Dict) -> str:
+    # One "frame;frame;frame count" line per stack, the input flamegraph.pl and speedscope take
+    return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].most_common())
+
+
+def render_text(profile: Dict, limit: int = 25) -> str:
+    # Functions by samples spent in them (self) and under them (total), as a share of the profile's samples
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in profile['stacks'].items():
+        frames = stack.split(';')[1:]
+        if frames:
+            self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+
+    samples = max(profile['samples'], 1)
+    lines = [
+        f"{profile['method']} {profile['path']} -> {profile['status']} in {profile['duration_ms']}ms "
+        f"({profile['reason']}, {profile['samples']} samples, {profile['in_flight']} requests in flight)",
+        ""
+    ]
+    for title, counts in (('Self', self_counts), ('Total', total_counts)):
+        lines.append(f"{title:>8}  {'%':>6}  Function")
+        for frame, count in counts.most_common(limit):
+            lines.append(f"{count:>8}  {count / samples:>6.1%}  {frame}")
+        lines.append("")
+    return '\n'.join(lines)
+
+
+request_profiler = SamplingProfiler()
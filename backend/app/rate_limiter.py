@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+class DomainRateLimiter:
+    # Token bucket per host. Each domain refills one token every `interval` seconds and holds at most
+    # `burst` tokens, so spacing is only enforced between requests to the same host and requests to
+    # different hosts never wait on each other. Domains without an interval are not limited at all.
+    def __init__(self, intervals: Dict[str, float], bursts: Dict[str, int] = None):
+        self.intervals = intervals
+        self.bursts = bursts or {}
+        self.lock = threading.Lock()
+        # Theoretical arrival time of the next request per domain (GCRA form of the token bucket)
+        self.next_slot: Dict[str, float] = {}
+        self.waiting: Dict[str, int] = {}
+        self.stats_by_domain: Dict[str, Dict[str, float]] = {}
+
+    def reserve(self, domain: str) -> float:
+        # Claim the next free slot for this domain and return how long the caller must wait for it
+        interval = self.intervals.get(domain, 0)
+        if interval <= 0:
+            return 0.0
+
+        burst = max(self.bursts.get(domain, 1), 1)
+        with self.lock:
+            now = time.monotonic()
+            next_slot = max(self.next_slot.get(domain, now), now)
+            start = max(now, next_slot - (burst - 1) * interval)
+            self.next_slot[domain] = max(next_slot, start) + interval
+            delay = start - now
+
+            stats = self.stats_by_domain.setdefault(domain, {
+                'requests': 0, 'delayed_requests': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0
+            })
+            stats['requests'] += 1
+            if delay > 0:
+                stats['delayed_requests'] += 1
+                stats['total_wait_seconds'] += delay
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], delay)
+                self.waiting[domain] = self.waiting.get(domain, 0) + 1
+        return delay
+
+    def release_waiter(self, domain: str):
+        with self.lock:
+            self.waiting[domain] -= 1
+
+    async def acquire(self, domain: str):
+        delay = self.reserve(domain)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.release_waiter(domain)
+
+    def acquire_sync(self, domain: str):
+        delay = self.reserve(domain)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            finally:
+                self.release_waiter(domain)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {
+                domain: {
+                    'min_interval_seconds': self.intervals.get(domain, 0),
+                    'queue_depth': self.waiting.get(domain, 0),
+                    'requests': stats['requests'],
+                    'delayed_requests': stats['delayed_requests'],
+                    'avg_wait_seconds': round(stats['total_wait_seconds'] / stats['requests'], 3),
+                    'max_wait_seconds': round(stats['max_wait_seconds'], 3),
+                    'total_wait_seconds': round(stats['total_wait_seconds'], 3)
+                }
+                for domain, stats in self.stats_by_domain.items()
+            }
@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Persistent store of fetched pages shared by restarts and by every worker process on the host
+SCRAPE_STORE_ENABLED = os.getenv('SCRAPE_STORE', '1') == '1'
+SCRAPE_STORE_PATH = os.getenv('SCRAPE_STORE_PATH', 'cache/scrape_store.sqlite3')
+SCRAPE_STORE_MAX_ENTRIES = int(os.getenv('SCRAPE_STORE_MAX_ENTRIES', '50000'))
+# Check the entry limit every this many inserts rather than on each one
+PRUNE_EVERY = 500
+
+class ScrapeStore:
+    # SQLite table of the article dict parsed from each fetched page, keyed by canonical URL, with the
+    # validators needed to revalidate with a conditional request. The HTML itself isn't kept, a 304 only
+    # needs the article and a changed page is parsed again.
+    def __init__(self, path: str = SCRAPE_STORE_PATH, max_entries: int = SCRAPE_STORE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.inserts = 0
+        # sqlite connections can't be shared between threads, so each thread opens its own
+        self.local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            # WAL lets readers in other workers keep going while one of them writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    article TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    validated_at REAL NOT NULL
+                )
+            ''')
+            self.local.connection = connection
+        return connection
+
+    def get(self, url: str) -> Optional[Dict]:
+        row = self.connect().execute(
+            'SELECT etag, last_modified, article, fetched_at, validated_at FROM pages WHERE url = ?',
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'article': json.loads(row[2]),
+            'fetched_at': row[3],
+            'validated_at': row[4]
+        }
+
+    def put(self, url: str, article: Dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO pages (url, etag, last_modified, article, fetched_at, validated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, json.dumps(article), now, now)
+            )
+        self.inserts += 1
+        if self.inserts % PRUNE_EVERY == 0:
+            self.prune()
+
+    def mark_validated(self, url: str):
+        # The publisher answered 304 Not Modified, so the stored copy is still current
+        with self.connect() as connection:
+            connection.execute('UPDATE pages SET validated_at = ? WHERE url = ?', (time.time(), url))
+
+    def prune(self):
+        # Keep the max_entries pages validated most recently
+        with self.connect() as connection:
+            connection.execute(
+                'DELETE FROM pages WHERE url IN '
+                '(SELECT url FROM pages ORDER BY validated_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    # Request headers that let the publisher answer 304 if the stored copy is still current
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+scrape_store = ScrapeStore() if SCRAPE_STORE_ENABLED else None
@@ -1,6 +1,14 @@
+import asyncio
+import httpx
 import requests
-from bs4 import BeautifulSoup
 from typing import Optional, Dict
+from .scrape_store import scrape_store, conditional_headers
+from .rate_limiter import DomainRateLimiter
+from .circuit_breaker import DomainCircuitBreaker, OPEN, HALF_OPEN
+from .cache import failed_url_cache
+from .extractors import extract_content
+from .download import HTMLDownload, ContentRejected, DOWNLOAD_CHUNK_SIZE
+from .metrics import time_stage, fetched_bytes, fetch_responses, CallbackMetric
 import re
 import random
 import time
@@ -20,7 +28,7 @@ USER_AGENTS = [
 # Sites that need special handling
 DIFFICULT_SITES = {
     'bbc.com': {
-        'throttle': 5,  # Extra delay in seconds
+        'throttle': 5,  # Minimum seconds between two requests to this site
         'mobile': False  # Don't use mobile user agent for BBC, it's not working
     },
     'nytimes.com': {
@@ -33,6 +41,48 @@ DIFFICULT_SITES = {
     }
 }
 
+# Delay before retrying a failed attempt
+RETRY_DELAY = 2
+
+# Politeness scheduling, 'throttle' is the minimum spacing between requests to the same site
+domain_rate_limiter = DomainRateLimiter(
+    {domain: config.get('throttle', 0) for domain, config in DIFFICULT_SITES.items()},
+    {domain: config['burst'] for domain, config in DIFFICULT_SITES.items() if 'burst' in config}
+)
+
+CallbackMetric(
+    'fakenews_rate_limit_queue_depth', 'Requests waiting for their domain\'s next free slot', 'gauge',
+    lambda: [({'domain': domain}, stats['queue_depth']) for domain, stats in domain_rate_limiter.stats().items()]
+)
+CallbackMetric(
+    'fakenews_rate_limit_wait_seconds_total', 'Total time requests spent waiting on per-domain spacing', 'counter',
+    lambda: [({'domain': domain}, stats['total_wait_seconds']) for domain, stats in domain_rate_limiter.stats().items()]
+)
+
+# Responses that say the site is refusing or failing us, rather than that this one URL is bad
+DOMAIN_FAILURE_STATUSES = {403, 429, 500, 502, 503, 504}
+# The article is gone, retrying won't bring it back
+PERMANENT_FAILURE_STATUSES = {404, 410}
+
+# Stop sending requests to sites that keep failing, see DomainCircuitBreaker
+domain_circuit_breaker = DomainCircuitBreaker()
+
+CircuitStates = {OPEN: 1, HALF_OPEN: 0.5}
+CallbackMetric(
+    'fakenews_circuit_state', 'Per-domain circuit breaker state: 0 closed, 0.5 half open (probing), 1 open', 'gauge',
+    lambda: [({'domain': domain}, CircuitStates.get(stats['state'], 0))
+             for domain, stats in domain_circuit_breaker.stats().items()]
+)
+
+# Connection pool settings for the shared async client
+FETCH_TIMEOUT = 15
+ASYNC_MAX_CONNECTIONS = 200
+ASYNC_MAX_KEEPALIVE_CONNECTIONS = 50
+_async_client: Optional[httpx.AsyncClient] = None
+
+# Shared session for the sync path so connections are reused between calls
+_session = requests.Session()
+
 # Current working fallback articles that demonstrate the system
 FALLBACK_ARTICLES = [
     {
@@ -62,6 +112,31 @@ def get_domain(url: str) -> str:
         domain = domain[4:]
     return domain
 
+# Query parameters that only track where a click came from and never change the article
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'cmpid', 'ocid', 'ref', 'smid', 'taid'}
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so the same article always maps to the same key."""
+    parsed_url = urllib.parse.urlparse(url.strip())
+    domain = parsed_url.netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parsed_url.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+    path = parsed_url.path.rstrip('/') or '/'
+
+    return urllib.parse.urlunparse((
+        parsed_url.scheme.lower() or 'https',
+        domain,
+        path,
+        '',
+        urllib.parse.urlencode(sorted(query)),
+        ''
+    ))
+
 def get_fallback_article() -> Dict[str, str]:
     # Return the working fallback article, since FALLBACK_ARTICLES now contains only one article, random.choice will always pick it, add more
     article = random.choice(FALLBACK_ARTICLES)
@@ -73,138 +148,323 @@ def get_fallback_article() -> Dict[str, str]:
         'original_url': article['url']
     }
 
+def serve_stale(stored: Dict) -> Dict[str, str]:
+    # The copy from the scrape store, however old, beats no article at all
+    return {**stored['article'], 'is_stale': True}
+
+def circuit_open(domain: str, stored: Optional[Dict]) -> Dict[str, str]:
+    if stored:
+        return serve_stale(stored)
+    retry_after = domain_circuit_breaker.retry_after(domain)
+    return {
+        'error': f"{domain} is failing or blocking requests, try again in {retry_after:.0f} seconds",
+        'status_code': 503
+    }
+
+def fail_fast(url_key: str, stored: Optional[Dict]) -> Optional[Dict[str, str]]:
+    # Answer without contacting the site when this URL failed recently, returns None when the request
+    # should go ahead. Checked before the circuit so it doesn't use up a half-open circuit's probe.
+    reason = failed_url_cache.get(url_key)
+    if reason is not None:
+        if stored:
+            return serve_stale(stored)
+        return {'error': f"The article failed to load recently: {reason}", 'status_code': 502}
+    return None
+
+def retry_allowed(domain: str, probe: bool) -> Optional[str]:
+    # Before a retry: the circuit may have opened while this request was waiting. The probe already holds
+    # the domain's one half-open slot, so it only stops if one of its own attempts reopened the circuit.
+    if probe:
+        return None if domain_circuit_breaker.state(domain) == OPEN else HALF_OPEN
+    return domain_circuit_breaker.allow(domain)
+
+def record_outcome(domain: str, status_code: int):
+    # Any answer from the site counts as the site being up, unless the answer is a refusal or server error
+    if status_code in DOMAIN_FAILURE_STATUSES:
+        domain_circuit_breaker.record_failure(domain)
+    else:
+        domain_circuit_breaker.record_success(domain)
+
+def give_up(url: str, url_key: str, stored: Optional[Dict], reason: str) -> Dict[str, str]:
+    # Every attempt failed: remember that for a while so repeat requests fail fast
+    failed_url_cache.set(url_key, reason)
+    if stored:
+        print(f"Failed to fetch {url}: {reason}. Serving the stored copy.")
+        return serve_stale(stored)
+    print(f"Failed to fetch {url}: {reason}")
+    return {'error': f"The article could not be fetched: {reason}", 'status_code': 502}
+
+def invalid_url(url: str, reason: Optional[str] = None) -> Optional[Dict[str, str]]:
+    # A URL no retry can fetch, answered before the site's circuit or rate limit is touched. Returns None
+    # for a fetchable http(s) URL, or the error when the HTTP client already rejected it with reason.
+    if reason is None:
+        try:
+            parsed = urllib.parse.urlparse(url)
+            if parsed.scheme not in ('http', 'https'):
+                reason = "only http and https addresses can be fetched"
+            elif not parsed.netloc:
+                reason = "no host name"
+            else:
+                return None
+        except ValueError as e:
+            reason = str(e)
+    return {'error': f"Invalid URL {url}: {reason}", 'status_code': 400}
+
+def build_headers(site_config: Dict) -> Dict[str, str]:
+    # Use appropriate user agent and comprehensive headers
+    if site_config.get('mobile', False):
+        user_agent = 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'
+    else:
+        user_agent = random.choice(USER_AGENTS)
+
+    headers = {
+        'User-Agent': user_agent,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'max-age=0',
+        'DNT': '1'  # Do Not Track
+    }
+
+    # Add referrer for sites that check referrer
+    if 'referrer' in site_config:
+        headers['Referer'] = site_config['referrer']
+
+    return headers
+
+def record_response(domain: str, status_code: int, size: int):
+    fetch_responses.inc(domain=domain, status=status_code)
+    fetched_bytes.inc(size, domain=domain)
+
+def parse_article_html(html: str, domain: str) -> Optional[Dict[str, str]]:
+    # Parse a fetched page into the article dict, returns None if no meaningful content was found
+    with time_stage('parse'):
+        title, date, article_text = extract_content(html)
+
+    # Ensure we have meaningful content
+    if article_text and len(article_text) > 200:
+        with time_stage('scraper_clean'):
+            text = clean_text(article_text)
+        return {
+            'text': text,
+            'title': title,
+            'date': date,
+            'source': domain
+        }
+    return None
+
 def extract_article_text(url: str, is_fallback: bool = False) -> Dict[str, str]:
     # If we're already using a fallback, or in recursion, just return a fallback directly
     if is_fallback:
         return get_fallback_article()
         
     # Extract the main text content from a news article URL
+    rejected = invalid_url(url)
+    if rejected is not None:
+        return rejected
     max_retries = 3
     
     # Extract domain for special handling
     domain = get_domain(url)
     site_config = DIFFICULT_SITES.get(domain, {})
-    extra_throttle = site_config.get('throttle', 0)
     
-    for attempt in range(max_retries):
-        try:
-            # Use appropriate user agent and comprehensive headers
-            if site_config.get('mobile', False):
-                user_agent = 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'
-            else:
-                user_agent = random.choice(USER_AGENTS)
-                
-            headers = {
-                'User-Agent': user_agent,
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Cache-Control': 'max-age=0',
-                'DNT': '1'  # Do Not Track
-            }
-            
-            # Add referrer for sites that check referrer
-            if 'referrer' in site_config:
-                headers['Referer'] = site_config['referrer']
-            
-            # Add a small delay between retries plus extra throttle for difficult sites
-            if attempt > 0 or extra_throttle > 0:
-                time.sleep(2 + extra_throttle)
-            
-            # Handle specific sites that are known to block scrapers
-            if domain == 'bbc.com' or domain == 'bbc.co.uk':
-                # Don't use mobile URLs for BBC, they're not resolving
-                pass
-                
-            session = requests.Session()
-            response = session.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
+    # A stored copy from an earlier run lets us ask the publisher whether anything changed
+    url_key = canonical_url(url)
+    stored = scrape_store.get(url_key) if scrape_store else None
+    
+    rejected = fail_fast(url_key, stored)
+    if rejected is not None:
+        return rejected
+    permit = domain_circuit_breaker.allow(domain)
+    if not permit:
+        return circuit_open(domain, stored)
+    probe = permit == HALF_OPEN
+    try:
+        reason = "no article content found"
+        for attempt in range(max_retries):
+            try:
+                headers = build_headers(site_config)
+                headers.update(conditional_headers(stored))
             
-            # Parse and remove unwanted elements
-            soup = BeautifulSoup(response.text, 'html.parser')
+                # Add a small delay between retries, then wait for this site's next free slot
+                if attempt > 0:
+                    time.sleep(RETRY_DELAY)
+                    permit = retry_allowed(domain, probe)
+                    if not permit:
+                        return circuit_open(domain, stored)
+                    probe = permit == HALF_OPEN
+                domain_rate_limiter.acquire_sync(domain)
             
-            # Remove unwanted elements
-            for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'aside', 'meta', 'svg', 'form']):
-                element.decompose()
+                # Handle specific sites that are known to block scrapers
+                if domain == 'bbc.com' or domain == 'bbc.co.uk':
+                    # Don't use mobile URLs for BBC, they're not resolving
+                    pass
                 
-            # Extract basic metadata about the article
-            title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text().strip()
-                
-            # Try to get article publication date
-            date = ""
-            date_tags = soup.find_all(['time', 'meta'], attrs={'property': 'article:published_time'})
-            if date_tags:
-                for tag in date_tags:
-                    if tag.has_attr('datetime'):
-                        date = tag['datetime']
-                        break
-                    elif tag.has_attr('content'):
-                        date = tag['content']
-                        break
-            
-            # Extract the main content
-            article_text = ""
-            
-            # 1) Look for article tag or main content container
-            article_container = None
-            for container_selector in ['article', 'main', '[role="main"]', '#main-content', '.article-body', '.story-body']:
-                container = soup.select_one(container_selector)
-                if container:
-                    article_container = container
+                # Stream the body so oversized or non-HTML responses are dropped early and reading stops at the article
+                html = None
+                with time_stage('fetch'):
+                    with _session.get(url, headers=headers, timeout=FETCH_TIMEOUT, stream=True) as response:
+                        record_outcome(domain, response.status_code)
+                        if 200 <= response.status_code < 300:
+                            download = HTMLDownload(response.headers)
+                            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                                if download.feed(chunk):
+                                    break
+                            html = download.text()
+                record_response(domain, response.status_code, download.bytes_read if html is not None else 0)
+                if response.status_code == 304 and stored:
+                    scrape_store.mark_validated(url_key)
+                    return stored['article']
+                if response.status_code in PERMANENT_FAILURE_STATUSES:
+                    reason = f"HTTP {response.status_code}"
                     break
-                    
-            if article_container:
-                # Get all paragraphs from the article container
-                paragraphs = article_container.find_all('p')
-                article_text = ' '.join(p.get_text().strip() for p in paragraphs if p.get_text().strip())
-            
-            # 2) If article container approach didn't work, try all paragraphs
-            if not article_text or len(article_text) < 200:
-                paragraphs = soup.find_all('p')
-                # Filter out short paragraphs that might be navigation/footer text
-                main_paragraphs = [p for p in paragraphs if len(p.get_text().strip()) > 20]
-                if main_paragraphs:
-                    article_text = ' '.join(p.get_text().strip() for p in main_paragraphs)
+                response.raise_for_status()
             
-            # 3) If all else fails, get all text
-            if not article_text or len(article_text) < 200:
-                # Last resort: get all text but filter out short lines
-                text_blocks = [t for t in soup.stripped_strings if len(t) > 20]
-                article_text = ' '.join(text_blocks)
-            
-            # Ensure we have meaningful content
-            if article_text and len(article_text) > 200:
-                cleaned_text = clean_text(article_text)
-                return {
-                    'text': cleaned_text,
-                    'title': title,
-                    'date': date,
-                    'source': domain
-                }
-                
-            # If we've exhausted all options and found no text
-            if attempt == max_retries - 1:
-                # Fall back to sample article if we can't extract this one
-                print(f"Could not extract content from {url}. Using fallback article.")
-                return get_fallback_article()
+                article = parse_article_html(html, domain)
+                if article:
+                    if scrape_store:
+                        scrape_store.put(url_key, article,
+                                         response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return article
+                reason = "no article content found"
                 
-        except requests.RequestException as e:
-            if attempt == max_retries - 1:
-                # Fall back to sample article if we can't get this one
-                print(f"Failed to fetch {url}: {str(e)}. Using fallback article.")
-                return get_fallback_article()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                # Fall back to sample article if we can't process this one
-                print(f"Error processing {url}: {str(e)}. Using fallback article.")
-                return get_fallback_article()
+            except ContentRejected as e:
+                reason = str(e)
+                break
+            except (requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                    requests.exceptions.InvalidURL) as e:
+                return invalid_url(url, str(e))
+            except requests.HTTPError as e:
+                reason = str(e)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # The site didn't answer at all
+                domain_circuit_breaker.record_failure(domain)
+                reason = str(e)
+            except requests.RequestException as e:
+                reason = str(e)
+            except Exception as e:
+                reason = f"error processing the page: {str(e)}"
     
-    # If we get here, something went wrong
-    return get_fallback_article()
+        # Fall back to the stored copy if we can't get this one
+        return give_up(url, url_key, stored, reason)
+    finally:
+        if probe:
+            domain_circuit_breaker.end_probe(domain)
+
+def get_async_client() -> httpx.AsyncClient:
+    # One pooled client per process so concurrent fetches reuse connections instead of opening a session per attempt
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+    return _async_client
+
+def set_async_client(client: httpx.AsyncClient):
+    # Replace the shared client, e.g. to route fetches to a local stand-in server in benchmarks
+    global _async_client
+    _async_client = client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+async def extract_article_text_async(url: str, is_fallback: bool = False) -> Dict[str, str]:
+    # Non-blocking version of extract_article_text, returns the same dict shape
+    if is_fallback:
+        return get_fallback_article()
+
+    rejected = invalid_url(url)
+    if rejected is not None:
+        return rejected
+    max_retries = 3
+
+    domain = get_domain(url)
+    site_config = DIFFICULT_SITES.get(domain, {})
+    client = get_async_client()
+
+    url_key = canonical_url(url)
+    stored = await asyncio.to_thread(scrape_store.get, url_key) if scrape_store else None
+
+    rejected = fail_fast(url_key, stored)
+    if rejected is not None:
+        return rejected
+    permit = domain_circuit_breaker.allow(domain)
+    if not permit:
+        return circuit_open(domain, stored)
+    probe = permit == HALF_OPEN
+    try:
+        reason = "no article content found"
+        for attempt in range(max_retries):
+            try:
+                headers = build_headers(site_config)
+                headers.update(conditional_headers(stored))
+
+                # Same backoff as the sync path, but it only suspends this request instead of the whole event loop
+                if attempt > 0:
+                    await asyncio.sleep(RETRY_DELAY)
+                    permit = retry_allowed(domain, probe)
+                    if not permit:
+                        return circuit_open(domain, stored)
+                    probe = permit == HALF_OPEN
+                await domain_rate_limiter.acquire(domain)
+
+                html = None
+                with time_stage('fetch'):
+                    async with client.stream('GET', url, headers=headers) as response:
+                        record_outcome(domain, response.status_code)
+                        if response.is_success:
+                            download = HTMLDownload(response.headers)
+                            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                                if download.feed(chunk):
+                                    break
+                            html = download.text()
+                record_response(domain, response.status_code, download.bytes_read if html is not None else 0)
+                if response.status_code == 304 and stored:
+                    await asyncio.to_thread(scrape_store.mark_validated, url_key)
+                    return stored['article']
+                if response.status_code in PERMANENT_FAILURE_STATUSES:
+                    reason = f"HTTP {response.status_code}"
+                    break
+                response.raise_for_status()
+
+                # Parsing is CPU-bound, run it off the event loop
+                article = await asyncio.to_thread(parse_article_html, html, domain)
+                if article:
+                    if scrape_store:
+                        await asyncio.to_thread(scrape_store.put, url_key, article,
+                                                response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return article
+                reason = "no article content found"
+
+            except ContentRejected as e:
+                reason = str(e)
+                break
+            except (httpx.UnsupportedProtocol, httpx.InvalidURL) as e:
+                return invalid_url(url, str(e))
+            except httpx.HTTPStatusError as e:
+                reason = str(e)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                domain_circuit_breaker.record_failure(domain)
+                reason = str(e) or type(e).__name__
+            except httpx.HTTPError as e:
+                reason = str(e)
+            except Exception as e:
+                reason = f"error processing the page: {str(e)}"
+
+        return give_up(url, url_key, stored, reason)
+    finally:
+        # Also runs when the request is cancelled, e.g. while waiting for the rate limiter
+        if probe:
+            domain_circuit_breaker.end_probe(domain)
 
 if __name__ == "__main__":
     test_url = "https://apnews.com/article/vaccines-fda-kennedy-covid-shots-rfk-trump-bb4de15b6ff955d6cd0b406aaec3cdc5" 
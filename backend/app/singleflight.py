@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from .metrics import coalesced_calls
+
+
+class SingleFlight:
+    # Coalesce concurrent calls with the same key into one task: the first caller starts it and everyone
+    # who arrives while it is running awaits the same result or exception. Nothing is kept afterwards,
+    # remembering results is the caches' job.
+    def __init__(self, name: str):
+        self.name = name
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            coalesced_calls.inc(name=self.name)
+        # Shielded so one caller disconnecting doesn't cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {'in_flight': len(self.in_flight)}
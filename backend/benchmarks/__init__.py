@@ -0,0 +1 @@
+# Offline benchmarks, run from the backend directory e.g. python -m benchmarks.bias_detector_bench
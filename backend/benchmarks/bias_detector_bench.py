@@ -0,0 +1,99 @@
+"""
+Compares the single-pass term matcher in bias_detector against the old per-term regex loop
+(one re.findall over the whole article for every term in every list), and detect_political_bias_batch
+against calling detect_political_bias once per article.
+
+    python -m benchmarks.bias_detector_bench --sizes 5000 50000 200000 --batch 2000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.bias_detector import (
+    LEFT_LEANING_TERMS,
+    RIGHT_LEANING_TERMS,
+    POLITICAL_TOPIC_INDICATORS,
+    category_counts,
+    count_terms,
+    detect_political_bias,
+    detect_political_bias_batch,
+)
+
+FILLER_WORDS = [
+    'the', 'a', 'of', 'and', 'to', 'in', 'said', 'people', 'year', 'market', 'report', 'officials',
+    'city', 'week', 'statement', 'according', 'company', 'local', 'new', 'first', 'time', 'order'
+]
+
+
+def legacy_counts(text: str):
+    # The per-term loop bias_detector used before the combined matcher (terms lowercased so CNN/MAGA match)
+    text_lower = text.lower()
+    counts = []
+    for term_list in [POLITICAL_TOPIC_INDICATORS, LEFT_LEANING_TERMS, RIGHT_LEANING_TERMS]:
+        total = 0
+        for term in term_list:
+            pattern = r'\b' + re.escape(term.lower()) + r'\b'
+            total += len(re.findall(pattern, text_lower))
+        counts.append(total)
+    return tuple(counts)
+
+
+def single_pass_counts(text: str):
+    return category_counts(count_terms(text.lower()))
+
+
+def make_article(size: int, seed: int = 0) -> str:
+    # Synthetic wire-style article with roughly 1 in 15 words drawn from the bias term lists
+    rng = random.Random(seed)
+    terms = POLITICAL_TOPIC_INDICATORS + LEFT_LEANING_TERMS + RIGHT_LEANING_TERMS
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(terms) if rng.random() < 1 / 15 else rng.choice(FILLER_WORDS)
+        if rng.random() < 0.05:
+            word = word.capitalize() + '.'
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def time_per_call(func, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bias_detector term counting")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 20000, 100000, 200000],
+                        help="Article lengths in characters")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=1000, help="Articles in the batch comparison")
+    parser.add_argument('--batch-chars', type=int, default=3000, help="Article length in the batch comparison")
+    args = parser.parse_args()
+
+    print(f"{'chars':>8} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}  counts match")
+    for size in args.sizes:
+        text = make_article(size, seed=size)
+        legacy = time_per_call(legacy_counts, text, args.repeat)
+        single = time_per_call(single_pass_counts, text, args.repeat)
+        match = legacy_counts(text) == single_pass_counts(text)
+        print(f"{size:>8} {legacy * 1000:>10.2f} {single * 1000:>15.2f} {legacy / single:>7.1f}x  {match}")
+
+    texts = [make_article(args.batch_chars, seed=seed) for seed in range(args.batch)]
+    start = time.perf_counter()
+    per_article = [detect_political_bias(text) for text in texts]
+    per_article_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = detect_political_bias_batch(texts)
+    batch_seconds = time.perf_counter() - start
+    print(f"\n{args.batch} articles of {args.batch_chars} chars: per article {per_article_seconds * 1000:.1f} ms, "
+          f"batch {batch_seconds * 1000:.1f} ms ({per_article_seconds / batch_seconds:.2f}x), "
+          f"results match {per_article == batched}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares the lxml and BeautifulSoup extraction backends on a local corpus of saved HTML pages.
+Without --corpus a set of synthetic news pages is generated so the benchmark runs offline.
+
+    python -m benchmarks.html_extraction_bench --corpus path/to/saved_pages
+"""
+
+import argparse
+import glob
+import os
+import random
+import time
+
+from app.extractors import extract_with_bs4, extract_with_lxml, lxml_html
+
+FILLER = (
+    "Officials said the measure would take effect next year after months of negotiations between "
+    "lawmakers, industry groups and local leaders who had pressed for changes to the original plan."
+).split()
+
+
+def synthetic_page(paragraphs: int, seed: int) -> str:
+    # A bloated news page: navigation, inline scripts and JSON, ads, an article body and a footer
+    rng = random.Random(seed)
+
+    def sentence(words=30):
+        return ' '.join(rng.choice(FILLER) for _ in range(words)).capitalize() + '.'
+
+    nav = ''.join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(80))
+    script = '<script>window.__DATA__ = {' + ','.join(f'"k{i}": "{sentence(8)}"' for i in range(300)) + '};</script>'
+    ads = ''.join(f'<div class="ad"><p>Sponsored {i}</p><img src="/ad{i}.png"></div>' for i in range(40))
+    body = ''.join(f'<p>{sentence()}</p><div class="related"><a href="/x{i}">Related story {i}</a></div>'
+                   for i in range(paragraphs))
+    return (
+        '<!DOCTYPE html><html><head><title>Synthetic story</title><style>.a{color:red}</style>'
+        f'{script}</head><body><header><nav><ul>{nav}</ul></nav></header>{ads}'
+        f'<main><article><h1>Headline</h1><time property="article:published_time" datetime="2025-05-22">May 22</time>'
+        f'{body}</article></main><aside>{ads}</aside><footer><p>Copyright notice and legal text here.</p></footer>'
+        '</body></html>'
+    )
+
+
+def load_corpus(path: str):
+    pages = []
+    for file_path in sorted(glob.glob(os.path.join(path, '**', '*.htm*'), recursive=True)):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append((os.path.relpath(file_path, path), f.read()))
+    return pages
+
+
+def time_backend(extract, pages, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [extract(html) for _, html in pages]
+    return (time.perf_counter() - start) / (repeat * len(pages)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends")
+    parser.add_argument('--corpus', help="Directory of saved .html pages")
+    parser.add_argument('--synthetic-pages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if lxml_html is None:
+        raise SystemExit("lxml is not installed, only the BeautifulSoup backend is available")
+
+    if args.corpus:
+        pages = load_corpus(args.corpus)
+        if not pages:
+            raise SystemExit(f"No .html files found under {args.corpus}")
+    else:
+        pages = [(f'synthetic-{i}', synthetic_page(20 + 10 * i, seed=i)) for i in range(args.synthetic_pages)]
+
+    total_kb = sum(len(html) for _, html in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KB total")
+
+    bs4_time, bs4_results = time_backend(extract_with_bs4, pages, args.repeat)
+    lxml_time, lxml_results = time_backend(extract_with_lxml, pages, args.repeat)
+
+    print(f"{'backend':<8} {'ms/page':>10} {'pages/s':>10}")
+    print(f"{'bs4':<8} {bs4_time * 1000:>10.2f} {1 / bs4_time:>10.1f}")
+    print(f"{'lxml':<8} {lxml_time * 1000:>10.2f} {1 / lxml_time:>10.1f}")
+    print(f"speedup {bs4_time / lxml_time:.1f}x")
+
+    mismatches = [name for (name, _), a, b in zip(pages, bs4_results, lxml_results) if a != b]
+    print(f"{len(pages) - len(mismatches)}/{len(pages)} pages extract identical title, date and text")
+    for name in mismatches[:10]:
+        print(f"  differs: {name}")
+
+
+if __name__ == "__main__":
+    main()
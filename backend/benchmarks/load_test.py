@@ -0,0 +1,296 @@
+"""
+Offline end-to-end load test. Saved news pages are served from a local stand-in HTTP server and the
+FastAPI app is driven at a fixed concurrency, reporting throughput, latency percentiles and CPU per
+request for /predict, /predict-batch and /analyze-url. Results go to a JSON file so runs on different
+commits can be diffed.
+
+Capture the articles.txt pages once (needs network):
+    python -m benchmarks.load_test --capture ../articles.txt
+Then run offline against the app in this process:
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --output results.json
+Or against a running server (analyze-url then fetches the stand-in server's own URLs):
+    python -m benchmarks.load_test --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from benchmarks.html_extraction_bench import synthetic_page
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus')
+INDEX_FILE = 'index.json'
+
+
+def load_index(corpus_dir: str):
+    # index.json maps each original article URL to its saved file inside the corpus directory
+    index_path = os.path.join(corpus_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def capture(urls_file: str, corpus_dir: str):
+    # Download every URL listed in articles.txt into the corpus, skipping ones already saved
+    with open(urls_file) as f:
+        urls = sorted({line.strip() for line in f if line.strip().startswith('http')})
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    index = load_index(corpus_dir)
+    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0 Safari/537.36'}
+    with httpx.Client(follow_redirects=True, timeout=30, headers=headers) as client:
+        for url in urls:
+            if url in index:
+                continue
+            try:
+                response = client.get(url)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"skipped {url}: {e}")
+                continue
+            file_name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.html'
+            with open(os.path.join(corpus_dir, file_name), 'w', encoding='utf-8') as out:
+                out.write(response.text)
+            index[url] = file_name
+            print(f"saved {url}")
+
+    with open(os.path.join(corpus_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=4)
+
+
+def build_pages(corpus_dir: str, synthetic: int):
+    # Returns {original url: html}, falling back to synthetic pages when nothing was captured
+    pages = {}
+    for url, file_name in load_index(corpus_dir).items():
+        with open(os.path.join(corpus_dir, file_name), encoding='utf-8', errors='replace') as f:
+            pages[url] = f.read()
+    if not pages:
+        for i in range(synthetic):
+            pages[f'https://apnews.com/article/synthetic-story-{i}'] = synthetic_page(20 + 5 * i, seed=i)
+    return pages
+
+
+def stand_in_path(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    return '/' + parsed.netloc + (parsed.path or '/') + (('?' + parsed.query) if parsed.query else '')
+
+
+def start_stand_in_server(pages):
+    # Local server answering for every captured site at /<host>/<path>
+    by_path = {stand_in_path(url): html.encode('utf-8') for url, html in pages.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = by_path.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StandInTransport(httpx.AsyncHTTPTransport):
+    # Sends every scraper request to the stand-in server while the app still sees the original URL
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = httpx.URL(base_url)
+
+    async def handle_async_request(self, request):
+        target = self.base_url.join(stand_in_path(str(request.url)))
+        request.url = target
+        request.headers['Host'] = target.netloc.decode('ascii')
+        return await super().handle_async_request(request)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def run_scenario(client, name, make_request, total_requests, concurrency, items_per_request=1):
+    latencies = []
+    errors = 0
+    counter = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, payload = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    result = {
+        'requests': total_requests,
+        'errors': errors,
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(total_requests / wall, 2),
+        'items_per_second': round(total_requests * items_per_request / wall, 2),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2)
+        },
+        # CPU of this process, which includes the app when it runs in-process
+        'cpu_ms_per_request': round(cpu / total_requests * 1000, 3)
+    }
+    print(f"{name:<14} {result['throughput_rps']:>9.1f} req/s  p50 {result['latency_ms']['p50']:>8.1f} ms  "
+          f"p95 {result['latency_ms']['p95']:>8.1f} ms  p99 {result['latency_ms']['p99']:>8.1f} ms  "
+          f"cpu {result['cpu_ms_per_request']:>7.2f} ms/req  errors {errors}")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, pages):
+    stand_in = start_stand_in_server(pages)
+    stand_in_url = f'http://127.0.0.1:{stand_in.server_address[1]}'
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+        # A separate server process can't be re-routed, so point it at the stand-in server's URLs
+        article_urls = [stand_in_url + stand_in_path(url) for url in pages]
+        lifespan = None
+    else:
+        from app import scraper
+        from app.main import app
+
+        scraper.set_async_client(httpx.AsyncClient(
+            transport=StandInTransport(stand_in_url),
+            timeout=scraper.FETCH_TIMEOUT,
+            follow_redirects=True
+        ))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://app', timeout=120)
+        article_urls = list(pages)
+        lifespan = app.router.lifespan_context(app)
+
+    # Article texts for /predict come from the same pages so text length matches real traffic
+    from app.extractors import extract_content
+    texts = [extract_content(html)[2] or 'placeholder article text ' * 20 for html in pages.values()]
+    rng = random.Random(0)
+
+    scenarios = {
+        'predict': (lambda i: ('POST', '/predict', {'text': rng.choice(texts)}), 1),
+        'predict-batch': (lambda i: ('POST', '/predict-batch',
+                                     {'texts': [rng.choice(texts) for _ in range(args.batch_size)]}), args.batch_size),
+        'analyze-url': (lambda i: ('POST', '/analyze-url', {'url': article_urls[i % len(article_urls)]}), 1),
+    }
+
+    results = {}
+    try:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        # One request per endpoint first so model loading isn't counted in the measurements
+        for name, (make_request, _) in scenarios.items():
+            if name in args.scenarios:
+                method, path, payload = make_request(0)
+                await client.request(method, path, json=payload)
+
+        for name, (make_request, items) in scenarios.items():
+            if name in args.scenarios:
+                results[name] = await run_scenario(client, name, make_request, args.requests, args.concurrency, items)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        stand_in.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the fake news API")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="Directory with saved pages and index.json")
+    parser.add_argument('--capture', metavar='URLS_FILE', help="Download the URLs in this file into the corpus and exit")
+    parser.add_argument('--base-url', help="Load test a running server instead of the app in this process")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--batch-size', type=int, default=32, help="Texts per /predict-batch request")
+    parser.add_argument('--synthetic-pages', type=int, default=20, help="Pages to generate when the corpus is empty")
+    parser.add_argument('--scenarios', nargs='+', default=['predict', 'predict-batch', 'analyze-url'])
+    parser.add_argument('--warm-cache', action='store_true',
+                        help="Keep the scrape/prediction caches and near-duplicate index on, "
+                             "by default every request does the full work")
+    parser.add_argument('--output', default='load_test_results.json')
+    args = parser.parse_args()
+
+    if args.capture:
+        capture(args.capture, args.corpus)
+        return
+
+    if not args.warm_cache:
+        # Must be set before the app is imported, the caches read them at import time
+        os.environ.setdefault('SCRAPE_STORE', '0')
+        os.environ.setdefault('SCRAPE_CACHE_MAX_ENTRIES', '0')
+        os.environ.setdefault('CACHE_MAX_ENTRIES', '0')
+        os.environ.setdefault('NEAR_DUP_INDEX', '0')
+
+    pages = build_pages(args.corpus, args.synthetic_pages)
+    print(f"{len(pages)} pages, concurrency {args.concurrency}, {args.requests} requests per scenario")
+    results = asyncio.run(run(args, pages))
+
+    report = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': git_commit(),
+        'config': {
+            'mode': 'http' if args.base_url else 'in-process',
+            'pages': len(pages),
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'batch_size': args.batch_size,
+            'warm_cache': args.warm_cache,
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
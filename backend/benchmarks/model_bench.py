@@ -0,0 +1,168 @@
+"""
+Microbenchmarks for the CPU-bound pieces behind the API, without any network access:
+ModelPredictor (clean + vectorize + score), model.clean_text, scraper.clean_text and
+detect_political_bias. Reports articles/second and peak memory per call across article lengths and
+batch sizes, plus time per KB so superlinear growth on long articles stands out.
+
+    python -m benchmarks.model_bench
+    python -m benchmarks.model_bench --datasets datasets/True.csv datasets/Fake.csv --lengths 500 5000 200000 --output model_bench.json
+    python -m benchmarks.model_bench --backend process --workers 8 --batch-sizes 64 256 1024
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.bias_detector_bench import make_article
+
+DEFAULT_LENGTHS = [500, 2000, 10000, 50000, 200000]
+DEFAULT_BATCH_SIZES = [1, 8, 64, 256, 1024]
+
+
+def held_out_texts(true_path: str, fake_path: str, limit: int = 2000):
+    # Articles the model never saw during training. Rebuilds the frame train_fake_news_model splits (both
+    # CSVs in the same order, missing and empty-after-cleaning texts dropped) and takes the same 20% test
+    # split, but returns the raw text since cleaning is part of what is measured.
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from app.preprocessing import clean_texts
+
+    texts = pd.concat([
+        pd.read_csv(true_path, usecols=['text']),
+        pd.read_csv(fake_path, usecols=['text'])
+    ], ignore_index=True)['text'].dropna()
+    cleaned = clean_texts(texts, n_jobs=os.cpu_count() or 1)
+    texts = texts[[len(text) > 0 for text in cleaned]].reset_index(drop=True)
+    # Same row count and random_state as vectorize_corpus, so the same rows land in the test split
+    _, held_out = train_test_split(texts, test_size=0.2, random_state=42)
+    return held_out.head(limit).tolist()
+
+
+def make_text(length: int, pool, rng) -> str:
+    # Build an article of exactly `length` characters, from held-out articles when available
+    if not pool:
+        return make_article(length, seed=length)
+    parts = []
+    total = 0
+    while total < length:
+        text = rng.choice(pool)
+        parts.append(text)
+        total += len(text) + 1
+    return ' '.join(parts)[:length]
+
+
+def measure(func, arg, min_seconds: float):
+    # Returns (seconds per call, peak bytes allocated during one call)
+    func(arg)
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func(arg)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / calls, peak
+
+
+def report(rows, title):
+    print(f"\n{title}")
+    print(f"{'function':<22} {'chars':>8} {'batch':>6} {'ms/call':>10} {'articles/s':>11} {'us/KB':>9} {'peak KB':>10}")
+    for row in rows:
+        print(f"{row['function']:<22} {row['chars']:>8} {row['batch_size']:>6} {row['seconds_per_call'] * 1000:>10.3f} "
+              f"{row['articles_per_second']:>11.1f} {row['us_per_kb']:>9.1f} {row['peak_memory_kb']:>10.1f}")
+
+
+def row(function, chars, batch_size, seconds, peak):
+    return {
+        'function': function,
+        'chars': chars,
+        'batch_size': batch_size,
+        'seconds_per_call': seconds,
+        'articles_per_second': batch_size / seconds,
+        'us_per_kb': seconds * 1e6 / (chars * batch_size / 1024),
+        'peak_memory_kb': peak / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model-level microbenchmarks")
+    parser.add_argument('--datasets', nargs=2, metavar=('TRUE_CSV', 'FAKE_CSV'),
+                        help="The training CSVs, articles are drawn from the split held out from training")
+    parser.add_argument('--lengths', type=int, nargs='+', default=DEFAULT_LENGTHS, help="Article lengths in characters")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--batch-chars', type=int, default=3000, help="Article length used for the batch size sweep")
+    parser.add_argument('--min-seconds', type=float, default=0.5, help="Minimum timing window per measurement")
+    parser.add_argument('--backend', choices=['thread', 'process'], default='thread', help="ModelPredictor backend")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for the process backend")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    # Caching would turn every repeat call into a lookup
+    os.environ.setdefault('CACHE_MAX_ENTRIES', '0')
+    from app.bias_detector import detect_political_bias
+    from app.model import clean_text as model_clean_text
+    from app.predict import ModelPredictor, PREDICT_WORKERS
+    from app.scraper import clean_text as scraper_clean_text
+
+    rng = random.Random(0)
+    pool = held_out_texts(*args.datasets) if args.datasets else []
+    predictor = ModelPredictor(backend=args.backend, workers=args.workers or PREDICT_WORKERS)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(predictor.load_model())
+
+    def predict_batch(texts):
+        results = loop.run_until_complete(predictor.predict_batch(texts))
+        if results and 'error' in results[0]:
+            raise RuntimeError(results[0]['error'])
+        return results
+
+    length_rows = []
+    for length in args.lengths:
+        text = make_text(length, pool, rng)
+        for name, func, arg in [
+            ('ModelPredictor', predict_batch, [text]),
+            ('model.clean_text', model_clean_text, text),
+            ('scraper.clean_text', scraper_clean_text, text),
+            ('detect_political_bias', detect_political_bias, text),
+        ]:
+            seconds, peak = measure(func, arg, args.min_seconds)
+            length_rows.append(row(name, length, 1, seconds, peak))
+    report(length_rows, "Article length sweep (batch size 1)")
+
+    batch_rows = []
+    for batch_size in args.batch_sizes:
+        texts = [make_text(args.batch_chars, pool, rng) for _ in range(batch_size)]
+        seconds, peak = measure(predict_batch, texts, args.min_seconds)
+        batch_rows.append(row('ModelPredictor', args.batch_chars, batch_size, seconds, peak))
+    report(batch_rows, f"Batch size sweep ({args.batch_chars} character articles)")
+    predictor.close()
+    loop.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'data': args.datasets or 'synthetic',
+                'model_type': type(predictor.model).__name__,
+                'backend': args.backend,
+                'workers': predictor.workers if args.backend == 'process' else None,
+                'length_sweep': length_rows,
+                'batch_sweep': batch_rows
+            }, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
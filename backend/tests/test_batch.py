@@ -0,0 +1,39 @@
+import json
+import os
+
+from app.batch import CHECKPOINT_FILE, load_checkpoint, save_checkpoint, write_part
+
+
+def test_restart_removes_only_run_files(tmp_path):
+    output_dir = str(tmp_path)
+    settings = {'input': 'archive.jsonl'}
+    checkpoint = load_checkpoint(output_dir, settings, restart=False)
+    write_part(output_dir, 0, [{'row': 0, 'prediction': 'Real'}], 'jsonl')
+    checkpoint['chunks_done'] = 1
+    save_checkpoint(output_dir, checkpoint)
+    (tmp_path / 'part-00001.jsonl.tmp').write_text('partial')
+    (tmp_path / 'notes.txt').write_text('keep me')
+    (tmp_path / 'part-summary.jsonl').write_text('keep me too')
+    (tmp_path / 'archive').mkdir()
+    (tmp_path / 'archive' / 'part-00000.jsonl').write_text('older run')
+
+    checkpoint = load_checkpoint(output_dir, settings, restart=True)
+
+    assert checkpoint['chunks_done'] == 0
+    assert sorted(os.listdir(output_dir)) == ['archive', 'notes.txt', 'part-summary.jsonl']
+    assert (tmp_path / 'notes.txt').read_text() == 'keep me'
+    assert (tmp_path / 'archive' / 'part-00000.jsonl').read_text() == 'older run'
+
+
+def test_resume_keeps_run_files(tmp_path):
+    output_dir = str(tmp_path)
+    settings = {'input': 'archive.jsonl'}
+    checkpoint = load_checkpoint(output_dir, settings, restart=False)
+    write_part(output_dir, 0, [{'row': 0, 'prediction': 'Real'}], 'jsonl')
+    checkpoint['chunks_done'] = 1
+    save_checkpoint(output_dir, checkpoint)
+
+    assert load_checkpoint(output_dir, settings, restart=False)['chunks_done'] == 1
+    with open(os.path.join(output_dir, 'part-00000.jsonl')) as f:
+        assert json.loads(f.readline())['prediction'] == 'Real'
+    assert os.path.exists(os.path.join(output_dir, CHECKPOINT_FILE))
@@ -0,0 +1,36 @@
+import pytest
+
+from app.preprocessing import clean_text, clean_texts
+
+# Expected outputs are what model.clean_text produced before it moved to app.preprocessing, which the
+# trained model was fitted on
+CASES = [
+    ('nearby washington', 'nearby washington'),
+    # "reuters - " goes before "by reuters" is tried, so the "by" stays
+    ('By Reuters - WASHINGTON (Reuters) - The Senate voted.', 'by washington the senate voted'),
+    ('WASHINGTON (AP) — Officials said', 'washington officials said'),
+    ('Reported by CNN — and BBC - staff', 'reported by and staff'),
+    ('Agence France Presse – PARIS', 'paris'),
+    ('by afp, by bloomberg', ''),
+    ('Read more at https://www.example.com/story?id=1 or email tips@example.com.', 'read more at or email'),
+    # IGNORECASE also folds the long s into "s"
+    ('Reuterſ - x by reuterſ', 'x'),
+    ("It’s a “historic” day; isn't it?", 'it s a historic day isn t it'),
+    ('snake_case stays', 'snake_case stays'),
+    ('', ''),
+]
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_clean_text_matches_training(text, expected):
+    assert clean_text(text) == expected
+
+
+def test_clean_text_non_string():
+    assert clean_text(None) == ''
+    assert clean_text(float('nan')) == ''
+
+
+def test_clean_texts_matches_clean_text():
+    texts = [text for text, _ in CASES] * 1000
+    assert clean_texts(texts, n_jobs=2) == [clean_text(text) for text in texts]
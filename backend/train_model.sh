@@ -17,7 +17,7 @@ source venv/bin/activate
 
 # Train the model
 echo -e "\n${GREEN}Training the model...${NC}"
-python -m app.model 
+python -m app.model "$@"
 
 if [ $? -eq 0 ]; then
     echo -e "\n${GREEN}Model training completed successfully.${NC}"